@@ -5,6 +5,7 @@ python ./manage.py collectstatic
 python ./manage.py migrate
 mkdir -p core/logs/gunicorn_access
 mkdir -p core/logs/gunicorn_error
+rm -rf /dev/shm/kbackend-metrics
 if [ $LOCAL_TEST ]; then
     APP_PORT=8000
 else
@@ -44,3 +44,16 @@ def decode_basic_token(auth_header):
         return None
 
     return b64decode(auth_header_split[1]).decode('ascii')
+
+
+def is_privileged_request(request):
+    """ Whether the request is made by another server or by a staff user, who may ask for diagnostics """
+    try:
+        basic_token = decode_basic_token(request.META.get('HTTP_AUTHORIZATION'))
+    except ValueError:
+        basic_token = None
+    if basic_token is not None and basic_token in settings.BASIC_TOKENS:
+        return True
+
+    user = getattr(request, 'user', None)
+    return bool(user and user.is_authenticated and user.is_staff)
@@ -0,0 +1,151 @@
+import functools
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+
+logger = logging.getLogger('core')
+
+_missing = object()
+
+
+def get_generation(key, alias=DEFAULT_CACHE_ALIAS):
+    """ Current value of a shared counter, cached values keyed by it are invalidated by incrementing it """
+    cache = caches[alias]
+    generation = cache.get(key)
+    if generation is None:
+        # Starting from the current time never reuses the value of an evicted counter
+        cache.add(key, time.time_ns(), None)
+        generation = cache.get(key)
+    return generation
+
+
+def increment_generation(key, alias=DEFAULT_CACHE_ALIAS):
+    cache = caches[alias]
+    try:
+        cache.incr(key)
+    except ValueError:
+        if cache.get(key) is not None:
+            # The counter is there but could not be written, eg. a locked or unavailable cache
+            logger.warning({'event': 'increment_generation_failed', 'key': key})
+        # A new counter from the current time is past every value handed out before
+        cache.set(key, time.time_ns(), None)
+
+
+class LocalCache:
+    """ Least recently used entries of this worker process, each one expires after its own timeout """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            value, expires = entry
+            if expires <= time.monotonic():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + timeout)
+            self._entries.move_to_end(key)
+            while len(self._entries) > settings.LOCAL_CACHE_MAX_ENTRIES:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+local_cache = LocalCache()
+
+
+class TieredCache:
+    """ Values of a namespace cached in this worker (L1) in front of the cache shared by the workers (L2)
+
+    The keys include the generation of the namespace, invalidate() drops every value of it with a single increment.
+    The L1 keeps values and the generation for at most local_timeout seconds, so changes made by another worker
+    are served from there until then. Values are shared between the requests of a worker and must not be modified.
+    """
+
+    def __init__(self, namespace, timeout, local_timeout=None, alias=DEFAULT_CACHE_ALIAS):
+        self.namespace = namespace
+        self.timeout = timeout
+        self.local_timeout = local_timeout
+        self.alias = alias
+        self._generation_key = f'{namespace}:generation'
+
+    def get(self, key, default=None):
+        key = self._key(key)
+        value = local_cache.get(key, _missing)
+        if value is _missing:
+            value = caches[self.alias].get(key, _missing)
+            if value is _missing:
+                return default
+            local_cache.set(key, value, self._local_timeout())
+        return value
+
+    def set(self, key, value):
+        key = self._key(key)
+        caches[self.alias].set(key, value, self.timeout)
+        local_cache.set(key, value, self._local_timeout())
+
+    def get_or_set(self, key, load):
+        value = self.get(key, _missing)
+        if value is _missing:
+            value = load()
+            self.set(key, value)
+        return value
+
+    def delete_many(self, keys):
+        """ Other workers may keep serving the values from their L1 for local_timeout seconds """
+        keys = [self._key(key) for key in keys]
+        caches[self.alias].delete_many(keys)
+        for key in keys:
+            local_cache.delete(key)
+
+    def invalidate(self):
+        increment_generation(self._generation_key, self.alias)
+        local_cache.delete(self._generation_key)
+
+    def cached(self, key=None):
+        """ Decorator that caches the results of the function, by default keyed by a hash of its arguments
+
+        The arguments have to be serializable to JSON unless a key function is given.
+        """
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                cache_key = key(*args, **kwargs) if key else _hash_arguments(args, kwargs)
+                return self.get_or_set(cache_key, lambda: func(*args, **kwargs))
+            return wrapper
+        return decorator
+
+    def _key(self, key):
+        generation = local_cache.get(self._generation_key)
+        if generation is None:
+            generation = get_generation(self._generation_key, self.alias)
+            local_cache.set(self._generation_key, generation, self._local_timeout())
+        return f'{self.namespace}:{generation}:{key}'
+
+    def _local_timeout(self):
+        return settings.LOCAL_CACHE_TIMEOUT if self.local_timeout is None else self.local_timeout
+
+
+def _hash_arguments(args, kwargs):
+    return hashlib.md5(json.dumps([args, kwargs], sort_keys=True).encode()).hexdigest()
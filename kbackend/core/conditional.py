@@ -0,0 +1,28 @@
+import hashlib
+
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+
+
+def conditional_get(version_func):
+    """ Answer If-None-Match and If-Modified-Since with 304 before the view runs
+
+    version_func(request, *args, **kwargs) is called with the arguments of the view and returns a tuple of the last
+    modification time of the response, or None, followed by anything else that changes with the response. It returns
+    None when the response can't be versioned, eg. for a 404. The ETag is a hash of the tuple.
+    """
+    def get_version(request, *args, **kwargs):
+        # Shared by the ETag and the Last-Modified header so that the version is only queried once
+        if not hasattr(request, '_conditional_version'):
+            request._conditional_version = version_func(request, *args, **kwargs)
+        return request._conditional_version
+
+    def etag(request, *args, **kwargs):
+        version = get_version(request, *args, **kwargs)
+        return hashlib.md5(repr(version).encode()).hexdigest() if version is not None else None
+
+    def last_modified(request, *args, **kwargs):
+        version = get_version(request, *args, **kwargs)
+        return version[0] if version is not None else None
+
+    return method_decorator(condition(etag_func=etag, last_modified_func=last_modified))
@@ -1,4 +1,9 @@
 import logging
+import operator
+from functools import reduce
+
+from django.db import connections, transaction
+from django.db.models import Case, F, Q, When
 
 logger = logging.getLogger('core')
 
@@ -6,3 +11,23 @@ logger = logging.getLogger('core')
 def log_ratelimit(request, **kwargs):
     ip = request.META.get('REMOTE_ADDR')
     logger.warning({'event': 'ratelimit', 'ip': ip, 'path': request.path, **kwargs})
+
+
+def bulk_increment(queryset, deltas, **updates):
+    """ Add the deltas to the fields of the rows in a single UPDATE, along with the other updates
+
+    deltas maps the lookup of a row, a tuple of (field, value) pairs, to the values added to its fields.
+    """
+    if not deltas:
+        return 0
+    rows = reduce(operator.or_, (Q(*lookup) for lookup in deltas))
+    fields = {field for row_deltas in deltas.values() for field in row_deltas}
+    for field in fields:
+        updates[field] = Case(*[When(Q(*lookup), then=F(field) + row_deltas[field])
+                                for lookup, row_deltas in deltas.items() if field in row_deltas], default=F(field))
+
+    with transaction.atomic(using=queryset.db, savepoint=False):
+        if connections[queryset.db].features.has_select_for_update:
+            # Always lock the rows in the same order so that concurrent batches can't deadlock
+            list(queryset.filter(rows).order_by('pk').select_for_update().values_list('pk', flat=True))
+        return queryset.filter(rows).update(**updates)
@@ -0,0 +1,47 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import Client, override_settings
+
+from core.querytracking import track_queries
+from users.models import User
+
+DB_ENGINE = 'django.contrib.sessions.backends.db'
+
+
+class Command(BaseCommand):
+    help = 'Compare the requests per second of an authenticated endpoint with database and with the configured sessions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--url', default='/api/v1/users/me/profile/')
+
+    def handle(self, *args, **options):
+        engines = [DB_ENGINE] if settings.SESSION_ENGINE == DB_ENGINE else [DB_ENGINE, settings.SESSION_ENGINE]
+
+        # The benchmark user and its sessions are rolled back
+        with transaction.atomic():
+            user = User.objects.create_user('benchmark.sessions', display_name='Benchmark Sessions')
+            for engine in engines:
+                requests_per_second, queries = self._benchmark(engine, user, options['url'], options['requests'])
+                self.stdout.write(f'{engine}: {requests_per_second:.0f} requests/s, {queries} queries/request')
+            transaction.set_rollback(True)
+
+    @staticmethod
+    def _benchmark(engine, user, url, count):
+        with override_settings(SESSION_ENGINE=engine):
+            client = Client(SERVER_NAME='localhost')
+            client.force_login(user)
+            # Only the warm-up request
+            with track_queries() as queries:
+                client.get(url, secure=True)
+
+            start = time.perf_counter()
+            for _ in range(count):
+                client.get(url, secure=True)
+            duration = time.perf_counter() - start
+
+            client.logout()
+        return count / duration, queries.count
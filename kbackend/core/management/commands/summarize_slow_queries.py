@@ -0,0 +1,76 @@
+import ast
+import re
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# Applied in order, they replace the parts of a statement that differ between runs of the same query
+NORMALIZATIONS = [
+    (re.compile(r'\s+'), ' '),
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'"s\d+_x\d+"'), '"s?"'),
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'%s'), '?'),
+    # IN lists and rows of multi-row INSERTs
+    (re.compile(r'\(\?(?:, \?)*\)(?:, \(\?(?:, \?)*\))*'), '(...)'),
+    # Multi-row INSERTs on SQLite
+    (re.compile(r'SELECT \?(?:, \?)*(?: UNION ALL SELECT \?(?:, \?)*)+'), 'SELECT ... UNION ALL ...'),
+]
+# Innermost frames of the most common call site that are printed
+CALL_SITE_SIZE = 3
+
+
+class Command(BaseCommand):
+    help = 'Summarize the slow query log, grouped by the shape of the queries and ordered by their total time'
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*', help='Log files, the current and the rotated slow query logs by default')
+        parser.add_argument('--limit', type=int, default=20, help='Number of query shapes printed')
+
+    def handle(self, *args, **options):
+        paths = options['paths'] or sorted((settings.BASE_DIR / 'core' / 'logs' / 'slow_queries').glob('slow_queries.log*'))
+
+        shapes = {}
+        for path in paths:
+            for entry in read_entries(path):
+                shape = shapes.setdefault(normalize(entry['sql']), {'durations': [], 'routes': Counter(), 'stacks': Counter()})
+                shape['durations'].append(entry['duration_ms'])
+                shape['routes'][entry['route'] or 'outside of a request'] += 1
+                shape['stacks'][tuple(entry['stack'][-CALL_SITE_SIZE:])] += 1
+
+        if not shapes:
+            self.stdout.write('No slow queries')
+            return
+
+        by_total = sorted(shapes.items(), key=lambda item: sum(item[1]['durations']), reverse=True)
+        for sql, shape in by_total[:options['limit']]:
+            durations = shape['durations']
+            self.stdout.write(f'{len(durations)} queries, total {sum(durations):.0f} ms, mean {sum(durations) / len(durations):.0f} ms, '
+                              f'max {max(durations):.0f} ms')
+            self.stdout.write(f'  {sql}')
+            routes = ', '.join(f'{route} ({count})' for route, count in shape['routes'].most_common())
+            self.stdout.write(f'  Routes: {routes}')
+            stack = shape['stacks'].most_common(1)[0][0]
+            self.stdout.write(f'  Called from: {" < ".join(reversed(stack)) or "-"}')
+
+
+def read_entries(path):
+    with open(path, encoding='utf-8') as log:
+        for line in log:
+            # asctime - name - levelname - message, see logging.conf
+            parts = line.rstrip('\n').split(' - ', 3)
+            if len(parts) < 4:
+                continue
+            try:
+                entry = ast.literal_eval(parts[3])
+            except (ValueError, SyntaxError):
+                continue
+            if isinstance(entry, dict) and entry.get('event') == 'slow_query':
+                yield entry
+
+
+def normalize(sql):
+    for pattern, replacement in NORMALIZATIONS:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
@@ -0,0 +1,177 @@
+import bisect
+import logging
+import os
+import pickle
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+
+logger = logging.getLogger('core')
+
+# Upper bounds of the latency histogram buckets, seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# {(name, labels): value}, labels are a tuple of (label, value) pairs
+_counters = Counter()
+# {(name, labels): [observations in each bucket..., observations above the last bucket, sum]}
+_histograms = {}
+_lock = threading.Lock()
+# Callbacks that return {name: value} of state shared by the workers, read when the metrics are rendered
+_gauges = []
+
+_publisher = None
+_publisher_lock = threading.Lock()
+_worker = None
+
+
+def increment(name, value=1, **labels):
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] += value
+
+
+def observe(name, value, **labels):
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _observe(key, value)
+
+
+def record_request(route, method, status, duration, query_count, query_duration):
+    route_label = (('route', route),)
+    with _lock:
+        _counters['http_requests', (('method', method), ('route', route), ('status', str(status)))] += 1
+        _counters['db_queries', route_label] += query_count
+        _counters['db_query_seconds', route_label] += query_duration
+        _observe(('http_request_duration_seconds', (('method', method), ('route', route))), duration)
+    _ensure_publisher()
+
+
+def register_gauges(callback):
+    """ Render the values returned by the callback, names that end in _total are rendered as counters """
+    _gauges.append(callback)
+
+
+def get_counter(name, **labels):
+    """ Value of the counter in this worker process """
+    with _lock:
+        return _counters.get((name, tuple(sorted(labels.items()))), 0)
+
+
+def publish():
+    """ Write the metrics of this worker to METRICS_DIR, where collect() merges the files of all workers """
+    if not settings.METRICS_DIR:
+        return
+    with _lock:
+        data = pickle.dumps((dict(_counters), {key: list(histogram) for key, histogram in _histograms.items()}))
+
+    path = _worker_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary_path = path.with_suffix('.tmp')
+    temporary_path.write_bytes(data)
+    os.replace(temporary_path, path)
+
+
+def collect():
+    """ Counters and histograms of all workers, the ones of workers that have exited included """
+    if not settings.METRICS_DIR:
+        with _lock:
+            return Counter(_counters), {key: list(histogram) for key, histogram in _histograms.items()}
+
+    publish()
+    counters = Counter()
+    histograms = {}
+    for path in Path(settings.METRICS_DIR).glob('*.pickle'):
+        worker_counters, worker_histograms = pickle.loads(path.read_bytes())
+        counters.update(worker_counters)
+        for key, histogram in worker_histograms.items():
+            if key in histograms:
+                histograms[key] = [total + value for total, value in zip(histograms[key], histogram)]
+            else:
+                histograms[key] = histogram
+    return counters, histograms
+
+
+def render():
+    """ Metrics of all workers in the Prometheus text format """
+    counters, histograms = collect()
+    lines = []
+
+    for name, samples in _group(counters).items():
+        lines.append(f'# TYPE kbackend_{name}_total counter')
+        for labels, value in samples:
+            lines.append(f'kbackend_{name}_total{_format_labels(labels)} {value}')
+
+    for name, samples in _group(histograms).items():
+        lines.append(f'# TYPE kbackend_{name} histogram')
+        for labels, histogram in samples:
+            count = 0
+            for bound, observations in zip([*LATENCY_BUCKETS, '+Inf'], histogram):
+                count += observations
+                lines.append(f'kbackend_{name}_bucket{_format_labels(labels + (("le", str(bound)),))} {count}')
+            lines.append(f'kbackend_{name}_sum{_format_labels(labels)} {histogram[-1]}')
+            lines.append(f'kbackend_{name}_count{_format_labels(labels)} {count}')
+
+    for callback in _gauges:
+        try:
+            values = callback()
+        except Exception:
+            logger.exception({'event': 'metrics_gauges_failed'})
+            continue
+        for name, value in values.items():
+            lines.append(f'# TYPE kbackend_{name} {"counter" if name.endswith("_total") else "gauge"}')
+            lines.append(f'kbackend_{name} {value}')
+
+    return '\n'.join(lines) + '\n'
+
+
+def _observe(key, value):
+    histogram = _histograms.get(key)
+    if histogram is None:
+        histogram = _histograms[key] = [0] * (len(LATENCY_BUCKETS) + 1) + [0]
+    histogram[bisect.bisect_left(LATENCY_BUCKETS, value)] += 1
+    histogram[-1] += value
+
+
+def _group(samples):
+    grouped = {}
+    for (name, labels), value in sorted(samples.items()):
+        grouped.setdefault(name, []).append((labels, value))
+    return grouped
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+    return '{' + ','.join(f'{label}="{value}"' for (label, _), value in zip(labels, escaped)) + '}'
+
+
+def _worker_path():
+    global _worker
+    # A file per process, the start time keeps a worker that reuses the pid of an exited one from overwriting it
+    if _worker is None or _worker[0] != os.getpid():
+        _worker = (os.getpid(), f'{os.getpid()}-{time.time_ns()}.pickle')
+    return Path(settings.METRICS_DIR) / _worker[1]
+
+
+def _ensure_publisher():
+    global _publisher
+    if not settings.METRICS_DIR or (_publisher and _publisher.is_alive()):
+        return
+    with _publisher_lock:
+        if _publisher and _publisher.is_alive():
+            return
+        _publisher = threading.Thread(target=_run_publisher, name='metrics-publisher', daemon=True)
+        _publisher.start()
+
+
+def _run_publisher():
+    while True:
+        time.sleep(settings.METRICS_PUBLISH_INTERVAL)
+        try:
+            publish()
+        except Exception:
+            logger.exception({'event': 'metrics_publish_failed'})
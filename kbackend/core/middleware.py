@@ -0,0 +1,102 @@
+import time
+
+from core import metrics, profiling, servertiming
+from core.basic_auth import is_privileged_request
+from core.querytracking import get_request_tracker, log_repeated_queries, track_request_queries
+
+# Other methods share a label, so that requests with made up methods cannot add label values
+METRIC_METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+
+class MetricsMiddleware:
+    """ Records the latency, the status and the database queries of the requests per route
+
+    Statements that run several times in a request are logged as N+1 query suspects.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with track_request_queries(request) as queries:
+            start = time.perf_counter()
+            response = self.get_response(request)
+            duration = time.perf_counter() - start
+
+        # The route pattern rather than the path, so that there is a label value per endpoint
+        route = request.resolver_match.route if request.resolver_match else 'unmatched'
+        method = request.method if request.method in METRIC_METHODS else 'other'
+        metrics.record_request(route, method, response.status_code, duration, queries.count, queries.duration)
+        log_repeated_queries(queries, route)
+        return response
+
+
+class ServerTimingMiddleware:
+    """ Adds a Server-Timing header with the time spent in authentication, queries, serializers and rendering
+
+    Only when the request has the X-Server-Timing header and it is made by a server or a staff user.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        servertiming.install()
+
+    def __call__(self, request):
+        if 'HTTP_X_SERVER_TIMING' not in request.META or not is_privileged_request(request):
+            return self.get_response(request)
+
+        timing = servertiming.start()
+        queries = get_request_tracker()
+        query_count, query_duration = queries.count, queries.duration
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            servertiming.stop()
+
+        timing.add('db', queries.duration - query_duration, f'{queries.count - query_count} queries')
+        timing.add('total', time.perf_counter() - start)
+        response['Server-Timing'] = timing.get_header()
+        return response
+
+    def process_template_response(self, request, response):
+        timing = servertiming.get_current()
+        if timing is not None:
+            # Rendered right after this returns
+            start = time.perf_counter()
+            response.add_post_render_callback(lambda response: timing.add('render', time.perf_counter() - start))
+        return response
+
+
+class ProfilingMiddleware:
+    """ Profiles the requests that ask for it with the X-Profile header and one in PROFILING_SAMPLE_EVERY of each route
+
+    Only servers and staff users may ask for a profile. They get a cProfile one, or a sampled one with
+    X-Profile: sample, and its file name in PROFILING_DIR in the X-Profile response header.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        profiler = getattr(request, 'profiler', None)
+        if profiler is not None:
+            profiler.stop()
+            path = profiling.save(profiler, request.resolver_match.route)
+            if request.profile_requested:
+                response['X-Profile'] = path.name
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.profile_requested = 'HTTP_X_PROFILE' in request.META and is_privileged_request(request)
+        if request.profile_requested:
+            request.profiler = profiling.StackSampler() if request.META['HTTP_X_PROFILE'] == 'sample' else profiling.CProfiler()
+        elif profiling.is_sampled(request.resolver_match.route):
+            request.profiler = profiling.StackSampler()
+        else:
+            return None
+        # Stopped once the response is rendered
+        request.profiler.start()
+        return None
@@ -0,0 +1,110 @@
+import base64
+import json
+
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 100
+
+
+def keyset_paginate(queryset, ordering, parameters):
+    """ Cursor based pagination on the given ordering, the last field of it must be unique
+
+    Returns the items of the page and the cursor of the next page, if there is one. Unlike OFFSET,
+    filtering on the position of the last item keeps deep pages as fast as the first one.
+    """
+    page_size = get_page_size(parameters)
+    queryset = queryset.order_by(*ordering)
+
+    cursor = parameters.get('cursor')
+    if cursor:
+        values = decode_cursor(cursor, queryset.model, ordering)
+        queryset = queryset.filter(_after(ordering, values))
+
+    items = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        next_cursor = encode_cursor([_get_value(items[-1], field.lstrip('-')) for field in ordering])
+    return items, next_cursor
+
+
+def keyset_paginate_union(querysets, ordering, parameters):
+    """ keyset_paginate over the union of the querysets, eg. one for each index that a filter with OR could use
+
+    Each queryset reads at most a page from its own index and the pages are merged, where an OR of the filters
+    would be a scan of one index with the other filter applied to every row. Items in more than one of the
+    querysets are returned once.
+    """
+    page_size = get_page_size(parameters)
+    cursor = parameters.get('cursor')
+    if cursor:
+        values = decode_cursor(cursor, querysets[0].model, ordering)
+        querysets = [queryset.filter(_after(ordering, values)) for queryset in querysets]
+
+    items = {}
+    for queryset in querysets:
+        for item in queryset.order_by(*ordering)[:page_size + 1]:
+            items[item.pk] = item
+    items = list(items.values())
+    # Stable sorts from the last field to the first one
+    for field in reversed(ordering):
+        items.sort(key=lambda item: _get_value(item, field.lstrip('-')), reverse=field.startswith('-'))
+
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        next_cursor = encode_cursor([_get_value(items[-1], field.lstrip('-')) for field in ordering])
+    return items, next_cursor
+
+
+def get_page_size(parameters):
+    try:
+        page_size = int(parameters.get('page_size', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise ValidationError('page_size must be a number')
+    return max(1, min(page_size, MAX_PAGE_SIZE))
+
+
+def encode_cursor(values):
+    values = [value.isoformat() if hasattr(value, 'isoformat') else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode('ascii')
+
+
+def decode_cursor(cursor, model, ordering):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        if not isinstance(values, list) or len(values) != len(ordering):
+            raise ValueError()
+        return [_get_field(model, field.lstrip('-')).to_python(value) for field, value in zip(ordering, values)]
+    except Exception:
+        raise ValidationError('Invalid cursor')
+
+
+def _after(ordering, values):
+    # (a, b) > (x, y) is a > x OR (a = x AND b > y), the leading a >= x lets the database use a range scan
+    first_field = ordering[0].lstrip('-')
+    condition = Q(**{f'{first_field}__{"lte" if ordering[0].startswith("-") else "gte"}': values[0]})
+
+    after = Q()
+    equal = Q()
+    for field, value in zip(ordering, values):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        after |= equal & Q(**{f'{name}__{lookup}': value})
+        equal &= Q(**{name: value})
+    return condition & after
+
+
+def _get_field(model, path):
+    *relations, name = path.split('__')
+    for relation in relations:
+        model = model._meta.get_field(relation).related_model
+    return model._meta.get_field(name)
+
+
+def _get_value(item, path):
+    for name in path.split('__'):
+        item = getattr(item, name)
+    return item
@@ -0,0 +1,98 @@
+import cProfile
+import re
+import sys
+import threading
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+
+# Seconds between the samples of StackSampler
+SAMPLE_INTERVAL = 0.001
+
+_requests = Counter()
+_requests_lock = threading.Lock()
+
+
+class CProfiler:
+    """ Deterministic profile of every function call, written in the pstats format """
+
+    suffix = '.pstats'
+
+    def __init__(self):
+        self._profile = cProfile.Profile()
+
+    def start(self):
+        self._profile.enable()
+
+    def stop(self):
+        self._profile.disable()
+
+    def write(self, path):
+        self._profile.dump_stats(path)
+
+
+class StackSampler:
+    """ Samples the stack of the thread from another one, written in the collapsed format of flame graphs
+
+    Lighter than CProfiler since the profiled code is not traced, short functions may not show up.
+    """
+
+    suffix = '.collapsed'
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()
+        self._thread_id = threading.get_ident()
+        self._stopped = threading.Event()
+        self._sampler = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+
+    def start(self):
+        self._sampler.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._sampler.join()
+
+    def write(self, path):
+        path.write_text(''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common()))
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is not None:
+                self.stacks[_collapse(frame)] += 1
+
+
+def is_sampled(route):
+    """ Whether the request is one of the PROFILING_SAMPLE_EVERY requests of the route that are profiled """
+    if not settings.PROFILING_SAMPLE_EVERY:
+        return False
+    with _requests_lock:
+        _requests[route] += 1
+        return _requests[route] % settings.PROFILING_SAMPLE_EVERY == 0
+
+
+def save(profiler, route):
+    """ Write the profile to PROFILING_DIR, where only the PROFILING_MAX_FILES newest ones are kept """
+    directory = Path(settings.PROFILING_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    name = f'{datetime.now().strftime("%Y%m%dT%H%M%S%f")}-{re.sub(r"[^A-Za-z0-9]+", "_", route).strip("_")}'
+    path = directory / f'{name}{profiler.suffix}'
+    profiler.write(path)
+
+    # File names start with the time, so the oldest ones sort first
+    profiles = sorted(directory.glob('*.*'))
+    for old_path in profiles[:max(len(profiles) - settings.PROFILING_MAX_FILES, 0)]:
+        old_path.unlink(missing_ok=True)
+    return path
+
+
+def _collapse(frame):
+    frames = []
+    while frame is not None:
+        code = frame.f_code
+        frames.append(f'{code.co_name} ({code.co_filename}:{code.co_firstlineno})')
+        frame = frame.f_back
+    return ';'.join(reversed(frames))
@@ -0,0 +1,126 @@
+import datetime
+import decimal
+import logging
+import threading
+import time
+import traceback
+from collections import Counter
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+logger = logging.getLogger('core')
+slow_query_logger = logging.getLogger('core.slow_queries')
+
+# A statement that runs this many times in a request, with any parameters, is logged as a N+1 query suspect
+N_PLUS_ONE_THRESHOLD = 5
+# Characters of the statements that are logged
+MAX_LOGGED_SQL_LENGTH = 500
+# Frames of the project that are logged with a slow query, the innermost ones
+SLOW_QUERY_STACK_SIZE = 8
+
+_local = threading.local()
+
+
+class QueryTracker:
+    """ Database execute wrapper that counts the queries, their total time and the runs of each statement
+
+    Queries that take SLOW_QUERY_THRESHOLD seconds or more are logged to the slow query log.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self, request=None):
+        self.request = request
+        self.count = 0
+        self.duration = 0.0
+        # Statements have placeholders for the parameters, so a query in a loop runs the same one every time
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.count += 1
+            self.duration += duration
+            self.statements[sql] += 1
+            if settings.SLOW_QUERY_THRESHOLD is not None and duration >= settings.SLOW_QUERY_THRESHOLD:
+                self._log_slow_query(sql, params, many, duration)
+
+    def get_repeated(self, threshold=N_PLUS_ONE_THRESHOLD):
+        return {sql: count for sql, count in self.statements.most_common() if count >= threshold}
+
+    def _log_slow_query(self, sql, params, many, duration):
+        resolver_match = self.request.resolver_match if self.request is not None else None
+        slow_query_logger.warning({
+            'event': 'slow_query',
+            'duration_ms': round(duration * 1000, 1),
+            'route': resolver_match.route if resolver_match else None,
+            'sql': sql,
+            # Only the number of rows of executemany
+            'params': f'{len(params)} rows' if many else redact_params(params),
+            'stack': get_call_site(),
+        })
+
+
+def get_request_tracker():
+    """ Tracker of the queries of the current thread, reset and installed by MetricsMiddleware for each request """
+    tracker = getattr(_local, 'tracker', None)
+    if tracker is None:
+        tracker = _local.tracker = QueryTracker()
+    return tracker
+
+
+@contextmanager
+def track_request_queries(request):
+    tracker = get_request_tracker()
+    tracker.reset(request)
+    # The connection of the thread does not change, looking it up for each request takes longer than the rest of the
+    # middleware
+    thread_connection = getattr(_local, 'connection', None)
+    if thread_connection is None:
+        thread_connection = _local.connection = connections[DEFAULT_DB_ALIAS]
+    # Never appended by hand, execute_wrapper() removes the last wrapper when it exits
+    with thread_connection.execute_wrapper(tracker):
+        yield tracker
+
+
+@contextmanager
+def track_queries(using=DEFAULT_DB_ALIAS):
+    tracker = QueryTracker()
+    with connections[using].execute_wrapper(tracker):
+        yield tracker
+
+
+def redact_params(params):
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return {name: _redact(value) for name, value in params.items()}
+    return [_redact(value) for value in params]
+
+
+def get_call_site():
+    """ Innermost frames of the stack that are in the project, as file:line function """
+    base_dir = str(settings.BASE_DIR)
+    frames = [frame for frame in traceback.extract_stack()[:-1]
+              if frame.filename.startswith(base_dir) and frame.filename != __file__ and 'site-packages' not in frame.filename]
+    return [f'{frame.filename[len(base_dir) + 1:]}:{frame.lineno} {frame.name}' for frame in frames[-SLOW_QUERY_STACK_SIZE:]]
+
+
+def log_repeated_queries(tracker, route):
+    for sql, count in tracker.get_repeated().items():
+        logger.warning({'event': 'n_plus_one_suspect', 'route': route, 'count': count, 'sql': sql[:MAX_LOGGED_SQL_LENGTH]})
+
+
+def _redact(value):
+    # Numbers and times are logged, strings and the rest may be personal data
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, (decimal.Decimal, datetime.date, datetime.time, datetime.timedelta)):
+        return str(value)
+    return f'<{type(value).__name__}>'
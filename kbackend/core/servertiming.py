@@ -0,0 +1,82 @@
+import functools
+import threading
+import time
+from collections import defaultdict
+
+from rest_framework.serializers import ListSerializer, Serializer
+from rest_framework.views import APIView
+
+_local = threading.local()
+_install_lock = threading.Lock()
+_installed = False
+
+
+class ServerTiming:
+    """ Time spent in each phase of a request, rendered as a Server-Timing header """
+
+    def __init__(self):
+        self.durations = defaultdict(float)
+        self.descriptions = {}
+        self.phase = None
+
+    def add(self, name, duration, description=None):
+        self.durations[name] += duration
+        if description:
+            self.descriptions[name] = description
+
+    def get_header(self):
+        metrics = []
+        for name, duration in self.durations.items():
+            metric = f'{name};dur={duration * 1000:.1f}'
+            if name in self.descriptions:
+                metric += f';desc="{self.descriptions[name]}"'
+            metrics.append(metric)
+        return ', '.join(metrics)
+
+
+def start():
+    _local.timing = ServerTiming()
+    return _local.timing
+
+
+def stop():
+    _local.timing = None
+
+
+def get_current():
+    return getattr(_local, 'timing', None)
+
+
+def timed(name):
+    """ Decorator that adds the time spent in the function to the phase of the request that is being timed
+
+    Calls inside another timed phase, like nested serializers, count towards the outer one.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            timing = getattr(_local, 'timing', None)
+            if timing is None or timing.phase is not None:
+                return func(*args, **kwargs)
+
+            timing.phase = name
+            start_time = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                timing.add(name, time.perf_counter() - start_time)
+                timing.phase = None
+        return wrapper
+    return decorator
+
+
+def install():
+    """ Time the authentication and the serializers of the DRF views, only requests that are timed pay for it """
+    global _installed
+    with _install_lock:
+        if _installed:
+            return
+        APIView.perform_authentication = timed('auth')(APIView.perform_authentication)
+        for serializer_class in (Serializer, ListSerializer):
+            serializer_class.data = property(timed('serialize')(serializer_class.data.fget))
+        _installed = True
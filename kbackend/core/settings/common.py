@@ -14,6 +14,8 @@ from pathlib import Path
 import os
 import logging.config
 
+from corsheaders.defaults import default_headers
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve(strict=True).parent.parent.parent
 
@@ -23,6 +25,8 @@ ALLOWED_HOSTS = ['.ksoccersl.com', 'localhost', '192.168.0.1']
 # Application definition
 
 INSTALLED_APPS = [
+    # Shared infrastructure, installed for its management commands
+    'core',
     'soccer',
     'users',
     'rest_framework',
@@ -36,16 +40,22 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.ServerTimingMiddleware',
+    'core.middleware.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Staff users ask for a Server-Timing header from the frontend, see core.middleware.ServerTimingMiddleware
+CORS_ALLOW_HEADERS = list(default_headers) + ['x-server-timing']
+
 ROOT_URLCONF = 'core.urls'
 
 TEMPLATES = [
@@ -119,6 +129,7 @@ REST_FRAMEWORK = {
 }
 
 os.makedirs(BASE_DIR / 'core' / 'logs' / 'app', exist_ok=True)
+os.makedirs(BASE_DIR / 'core' / 'logs' / 'slow_queries', exist_ok=True)
 logging.config.fileConfig(BASE_DIR / 'logging.conf')
 
 LOGLEVEL = 'INFO'
@@ -135,11 +146,50 @@ DATABASES = {
 
 LOGIN_URL = '/login'
 
+# Posted soccer stats can be queued in a local journal and written to the database in batches
+# by a background thread, see soccer/stat_buffer.py
+STAT_BUFFER_ENABLED = False
+STAT_BUFFER_PATH = DB_PATH / 'stat_buffer.sqlite3'
+STAT_BUFFER_MAX_DEPTH = 20000
+STAT_BUFFER_BATCH_SIZE = 500
+# Seconds
+STAT_BUFFER_FLUSH_INTERVAL = 2
+# Flushes that a stat may fail in a row before it is moved aside to the failed_stats table
+STAT_BUFFER_MAX_ATTEMPTS = 10
+
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
         'LOCATION': 'default',
-    }
+    },
+    'sessions': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'sessions',
+    },
 }
+# In-process cache in front of the shared one, see core.cache.TieredCache. Changes made by another worker are
+# visible after LOCAL_CACHE_TIMEOUT seconds
+LOCAL_CACHE_MAX_ENTRIES = 1000
+LOCAL_CACHE_TIMEOUT = 5
+
+# Directory where each worker publishes its metrics for the others, see core.metrics. Only the metrics of the
+# worker that serves the request are reported when this is not set
+METRICS_DIR = None
+# Seconds
+METRICS_PUBLISH_INTERVAL = 5
+
+# Queries of requests that take this many seconds or more are written to core/logs/slow_queries, None turns it off
+SLOW_QUERY_THRESHOLD = 0.1
+
+# Profiles of the requests, see core.middleware.ProfilingMiddleware. One in PROFILING_SAMPLE_EVERY requests of each
+# route is profiled in each worker, 0 turns the sampling off
+PROFILING_DIR = BASE_DIR / 'core' / 'logs' / 'profiles'
+PROFILING_MAX_FILES = 200
+PROFILING_SAMPLE_EVERY = 0
+
+# Sessions are read from the sessions cache and written through to the database, so they survive a cache flush.
+# The cache has to be shared by all workers, otherwise a worker could keep a session that was logged out in another
+SESSION_ENGINE = os.environ.get('SESSION_ENGINE', 'django.contrib.sessions.backends.cached_db')
+SESSION_CACHE_ALIAS = 'sessions'
 
 RATELIMIT_ENABLE = False
@@ -5,7 +5,7 @@ import sentry_sdk
 from sentry_sdk.integrations.django import DjangoIntegration
 
 from core.settings.common import *  # noqa: F401, F403
-from core.settings.common import BASE_DIR, MIDDLEWARE
+from core.settings.common import BASE_DIR, DB_PATH, MIDDLEWARE
 
 
 def before_send(event, hint):
@@ -73,4 +73,29 @@ CSRF_COOKIE_SAMESITE = 'None'
 SESSION_COOKIE_SAMESITE = 'None'
 LANGUAGE_COOKIE_SAMESITE = 'None'
 
+# Shared by the workers of the host, in memory unless noted otherwise
+# The files on /dev/shm share the shm_size of docker-compose.yml, with room left for their WAL files and the metrics
+CACHES = {
+    'default': {
+        'BACKEND': 'core.sqlite_cache.SQLiteCache',
+        'LOCATION': '/dev/shm/kbackend-cache.sqlite3',
+        'OPTIONS': {'MAX_ENTRIES': 100000, 'MAX_SIZE': 96 * 1024 * 1024},
+    },
+    'sessions': {
+        'BACKEND': 'core.sqlite_cache.SQLiteCache',
+        'LOCATION': '/dev/shm/kbackend-sessions.sqlite3',
+        'OPTIONS': {'MAX_ENTRIES': 100000, 'MAX_SIZE': 64 * 1024 * 1024},
+    },
+    # On the database volume so that the counters survive restarts and deployments
+    'ratelimit': {
+        'BACKEND': 'core.sqlite_cache.SQLiteCache',
+        'LOCATION': str(DB_PATH / 'ratelimit.sqlite3'),
+        'OPTIONS': {'MAX_ENTRIES': 100000, 'MAX_SIZE': 64 * 1024 * 1024},
+    },
+}
+
+METRICS_DIR = '/dev/shm/kbackend-metrics'
+PROFILING_SAMPLE_EVERY = 1000
+
 RATELIMIT_ENABLE = True
+RATELIMIT_USE_CACHE = 'ratelimit'
@@ -0,0 +1,194 @@
+import logging
+import os
+import pickle
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import BaseCache, DEFAULT_TIMEOUT
+
+logger = logging.getLogger('core')
+
+# One in this many writes also deletes the expired entries
+CULL_EVERY = 100
+
+
+class SQLiteCache(BaseCache):
+    """ Cache in a SQLite file that is shared by all workers on the host, LOCATION is the path of the file
+
+    The file is meant to be on a tmpfs like /dev/shm. Integers are stored as they are so that incr() is a single
+    atomic UPDATE, other values are pickled. The MAX_SIZE option caps the size of the file in bytes, MAX_ENTRIES
+    does not bound the size of the values. Writes that fail, eg. because the file is
+    full or locked, are logged and treated as misses rather than failing the request.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self.path = location
+        self._max_size = params.get('OPTIONS', {}).get('MAX_SIZE')
+        self._local = threading.local()
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        try:
+            with self._transaction() as db:
+                # Replaces an expired entry but not a live one
+                cursor = db.execute('INSERT INTO cache (key, value, expires) VALUES (?, ?, ?) '
+                                    'ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires '
+                                    'WHERE cache.expires IS NOT NULL AND cache.expires <= ?',
+                                    (key, self._dumps(value), self.get_backend_timeout(timeout), now))
+                return cursor.rowcount == 1
+        except sqlite3.OperationalError as ex:
+            self._write_failed(ex)
+            return False
+
+    def get(self, key, default=None, version=None):
+        row = self._connect().execute('SELECT value FROM cache WHERE key = ? AND (expires IS NULL OR expires > ?)',
+                                      (self._key(key, version), time.time())).fetchone()
+        return self._loads(row[0]) if row else default
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        if not keys:
+            return {}
+        rows = self._connect().execute(
+            f'SELECT key, value FROM cache WHERE key IN ({", ".join("?" * len(keys))}) AND (expires IS NULL OR expires > ?)',
+            (*keys, time.time()))
+        return {keys[key]: self._loads(value) for key, value in rows}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._set_many({self._key(key, version): value}, timeout)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        self._set_many({self._key(key, version): value for key, value in data.items()}, timeout)
+        return []
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        try:
+            with self._transaction() as db:
+                cursor = db.execute('UPDATE cache SET expires = ? WHERE key = ? AND (expires IS NULL OR expires > ?)',
+                                    (self.get_backend_timeout(timeout), self._key(key, version), time.time()))
+                return cursor.rowcount == 1
+        except sqlite3.OperationalError as ex:
+            self._write_failed(ex)
+            return False
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        try:
+            with self._transaction() as db:
+                cursor = db.execute("UPDATE cache SET value = value + ? WHERE key = ? AND typeof(value) = 'integer' "
+                                    "AND (expires IS NULL OR expires > ?)", (delta, key, time.time()))
+                if cursor.rowcount == 0:
+                    raise ValueError(f"Key '{key}' not found")
+                return db.execute('SELECT value FROM cache WHERE key = ?', (key,)).fetchone()[0]
+        except sqlite3.OperationalError as ex:
+            self._write_failed(ex)
+            # Like a memcached server that is unavailable
+            raise ValueError(f"Key '{key}' could not be incremented") from ex
+
+    def delete(self, key, version=None):
+        try:
+            with self._transaction() as db:
+                return db.execute('DELETE FROM cache WHERE key = ?', (self._key(key, version),)).rowcount == 1
+        except sqlite3.OperationalError as ex:
+            self._write_failed(ex)
+            return False
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        if keys:
+            try:
+                with self._transaction() as db:
+                    db.execute(f'DELETE FROM cache WHERE key IN ({", ".join("?" * len(keys))})', keys)
+            except sqlite3.OperationalError as ex:
+                self._write_failed(ex)
+
+    def has_key(self, key, version=None):
+        return self._connect().execute('SELECT 1 FROM cache WHERE key = ? AND (expires IS NULL OR expires > ?)',
+                                       (self._key(key, version), time.time())).fetchone() is not None
+
+    def clear(self):
+        try:
+            with self._transaction() as db:
+                db.execute('DELETE FROM cache')
+        except sqlite3.OperationalError as ex:
+            self._write_failed(ex)
+
+    def _set_many(self, data, timeout):
+        expires = self.get_backend_timeout(timeout)
+        try:
+            with self._transaction() as db:
+                db.executemany('INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)',
+                               [(key, self._dumps(value), expires) for key, value in data.items()])
+                if random.randrange(CULL_EVERY) == 0:
+                    self._cull(db)
+        except sqlite3.OperationalError as ex:
+            self._write_failed(ex)
+
+    def _write_failed(self, ex):
+        logger.warning({'event': 'sqlite_cache_write_failed', 'path': self.path, 'error': str(ex)})
+        try:
+            # Makes room in case the file is full
+            with self._transaction() as db:
+                self._cull(db, force=True)
+        except sqlite3.OperationalError:
+            pass
+
+    def _cull(self, db, force=False):
+        db.execute('DELETE FROM cache WHERE expires <= ?', (time.time(),))
+        count = db.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count > self._max_entries or force:
+            # The entries that expire first go first, like in the other backends the order is arbitrary otherwise
+            db.execute('DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY expires IS NULL, expires LIMIT ?)',
+                       (count // self._cull_frequency,))
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    @staticmethod
+    def _dumps(value):
+        if type(value) is int:
+            return value
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _loads(value):
+        if isinstance(value, int):
+            return value
+        return pickle.loads(value)
+
+    @contextmanager
+    def _transaction(self):
+        db = self._connect()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            yield db
+            db.execute('COMMIT')
+        except BaseException:
+            # SQLite rolls back by itself after some errors, eg. when the file is full
+            if db.in_transaction:
+                db.execute('ROLLBACK')
+            raise
+
+    def _connect(self):
+        # A worker forked with a connection of its parent opens its own
+        db = getattr(self._local, 'db', None)
+        if db is None or self._local.pid != os.getpid():
+            db = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            db.execute('PRAGMA journal_mode=WAL')
+            # The cache does not need to survive a power loss
+            db.execute('PRAGMA synchronous=OFF')
+            if self._max_size:
+                # Writes past it fail with "database or disk is full" rather than filling the file system
+                page_size = db.execute('PRAGMA page_size').fetchone()[0]
+                db.execute(f'PRAGMA max_page_count = {self._max_size // page_size}')
+            db.execute('CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB, expires REAL) WITHOUT ROWID')
+            self._local.db = db
+            self._local.pid = os.getpid()
+        return db
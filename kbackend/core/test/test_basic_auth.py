@@ -1,7 +1,10 @@
 from base64 import b64encode
 
-from core.basic_auth import decode_basic_token
+from django.test import RequestFactory
+
+from core.basic_auth import decode_basic_token, is_privileged_request
 from core.test.testhelpers import TestCase
+from users.models import User
 
 
 class BasicAuthTest(TestCase):
@@ -45,3 +48,31 @@ class DecodeBasicTokenTestCase(TestCase):
         basic_token = decode_basic_token('invalid-auth')
 
         self.assertIsNone(basic_token)
+
+
+class IsPrivilegedRequestTest(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.factory = RequestFactory()
+
+    def test_server(self):
+        self.assertTrue(is_privileged_request(self.factory.get('/', HTTP_AUTHORIZATION=self.valid_auth)))
+
+    def test_wrong_password(self):
+        self.assertFalse(is_privileged_request(self.factory.get('/', HTTP_AUTHORIZATION=self.invalid_auth)))
+
+    def test_malformed_token(self):
+        self.assertFalse(is_privileged_request(self.factory.get('/', HTTP_AUTHORIZATION='basic %%%')))
+
+    def test_staff(self):
+        request = self.factory.get('/')
+        request.user = User(username='admin', is_staff=True)
+
+        self.assertTrue(is_privileged_request(request))
+
+    def test_user(self):
+        request = self.factory.get('/')
+        request.user = User(username='player')
+
+        self.assertFalse(is_privileged_request(request))
@@ -0,0 +1,126 @@
+from unittest.mock import Mock, patch
+
+from django.core.cache import cache
+from django.test import override_settings
+
+from core.cache import TieredCache, get_generation, increment_generation, local_cache
+from core.test.testhelpers import TestCase
+
+
+class TieredCacheTest(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.cache = TieredCache('test', 60)
+
+    def test_get_or_set(self):
+        load = Mock(return_value={'value': 1})
+
+        self.assertEqual({'value': 1}, self.cache.get_or_set('key', load))
+        self.assertEqual({'value': 1}, self.cache.get_or_set('key', load))
+        self.assertEqual(1, load.call_count)
+
+    def test_falsy_value_cached(self):
+        load = Mock(return_value=None)
+
+        self.cache.get_or_set('key', load)
+        self.cache.get_or_set('key', load)
+        self.assertEqual(1, load.call_count)
+
+    def test_served_from_local_cache(self):
+        self.cache.set('key', 'value')
+        cache.clear()
+
+        self.assertEqual('value', self.cache.get('key'))
+
+    def test_loaded_from_shared_cache(self):
+        self.cache.set('key', 'value')
+        local_cache.clear()
+
+        self.assertEqual('value', self.cache.get('key'))
+        cache.clear()
+        self.assertEqual('value', self.cache.get('key'))
+
+    def test_invalidate(self):
+        self.cache.set('key', 'value')
+        other = TieredCache('other', 60)
+        other.set('key', 'other value')
+
+        self.cache.invalidate()
+
+        self.assertIsNone(self.cache.get('key'))
+        self.assertEqual('other value', other.get('key'))
+
+    def test_invalidated_by_other_worker(self):
+        self.cache.set('key', 'value')
+        self.cache.get('key')
+
+        # Another worker only increments the shared generation, this one notices it when its local copy expires
+        cache.incr('test:generation')
+        self.assertEqual('value', self.cache.get('key'))
+        local_cache.clear()
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_delete_many(self):
+        self.cache.set(1, 'one')
+        self.cache.set(2, 'two')
+
+        self.cache.delete_many([1])
+
+        self.assertIsNone(self.cache.get(1))
+        self.assertEqual('two', self.cache.get(2))
+
+    def test_local_timeout(self):
+        self.cache.local_timeout = 0
+        self.cache.set('key', 'value')
+        cache.clear()
+
+        self.assertIsNone(self.cache.get('key'))
+
+    @override_settings(LOCAL_CACHE_MAX_ENTRIES=3)
+    def test_least_recently_used_evicted(self):
+        # The generation of the namespace takes an entry as well
+        self.cache.set('first', 1)
+        self.cache.set('second', 2)
+        self.cache.get('first')
+        self.cache.set('third', 3)
+        cache.clear()
+
+        self.assertEqual(1, self.cache.get('first'))
+        self.assertIsNone(self.cache.get('second'))
+
+    def test_cached(self):
+        load = Mock(side_effect=lambda a, b=0: a + b)
+        cached_load = self.cache.cached()(load)
+
+        self.assertEqual(3, cached_load(1, b=2))
+        self.assertEqual(3, cached_load(1, b=2))
+        self.assertEqual(1, cached_load(1))
+        self.assertEqual(2, load.call_count)
+
+    def test_cached_with_key(self):
+        load = Mock(side_effect=lambda user: user['id'])
+        cached_load = self.cache.cached(key=lambda user: user['id'])(load)
+
+        cached_load({'id': 1, 'name': 'first'})
+        cached_load({'id': 1, 'name': 'second'})
+        self.assertEqual(1, load.call_count)
+
+
+class GenerationTest(TestCase):
+
+    def test_increment(self):
+        generation = get_generation('test:generation')
+
+        increment_generation('test:generation')
+        self.assertEqual(generation + 1, get_generation('test:generation'))
+
+    def test_increment_failed(self):
+        generation = get_generation('test:generation')
+
+        # A counter that could not be incremented is replaced by a newer one, rather than keeping its value
+        logger = self.patch('core.cache.logger')
+        with patch('django.core.cache.backends.locmem.LocMemCache.incr', side_effect=ValueError):
+            increment_generation('test:generation')
+        logger.warning.assert_called_once()
+        self.assertGreater(get_generation('test:generation'), generation)
@@ -0,0 +1,91 @@
+import tempfile
+from unittest.mock import patch
+
+from django.test import override_settings
+
+from core import metrics
+from core.test.testhelpers import TestCase
+from users.models import User
+
+
+class MetricsViewTest(TestCase):
+
+    def test_success(self):
+        metrics.increment('test_counter', 2)
+
+        response = self.client.get('/api/v1/core/metrics/', HTTP_AUTHORIZATION=self.valid_auth)
+
+        self.assertEqual(200, response.status_code)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        self.assertIn('# TYPE kbackend_test_counter_total counter', response.content.decode())
+
+    def test_unauthorized(self):
+        response = self.client.get('/api/v1/core/metrics/', HTTP_AUTHORIZATION=self.invalid_auth)
+
+        self.assertEqual(401, response.status_code)
+
+
+class MetricsMiddlewareTest(TestCase):
+
+    def test_request_recorded(self):
+        user = User.objects.create(username='player')
+        route = 'api/v1/users/profile/<int:user_id>/'
+        requests = metrics.get_counter('http_requests', method='GET', route=route, status='200')
+        queries = metrics.get_counter('db_queries', route=route)
+
+        self.client.get(f'/api/v1/users/profile/{user.id}/')
+
+        self.assertEqual(requests + 1, metrics.get_counter('http_requests', method='GET', route=route, status='200'))
+        self.assertGreater(metrics.get_counter('db_queries', route=route), queries)
+
+    def test_unmatched_route(self):
+        requests = metrics.get_counter('http_requests', method='other', route='unmatched', status='404')
+
+        self.client.generic('BREW', '/coffee/')
+
+        self.assertEqual(requests + 1, metrics.get_counter('http_requests', method='other', route='unmatched', status='404'))
+
+
+class RenderTest(TestCase):
+
+    def test_histogram(self):
+        with patch.object(metrics, '_histograms', {}):
+            metrics.observe('test_seconds', 0.007, route='a/"b"/')
+            metrics.observe('test_seconds', 20, route='a/"b"/')
+
+            text = metrics.render()
+
+        self.assertIn('kbackend_test_seconds_bucket{route="a/\\"b\\"/",le="0.005"} 0', text)
+        self.assertIn('kbackend_test_seconds_bucket{route="a/\\"b\\"/",le="0.01"} 1', text)
+        self.assertIn('kbackend_test_seconds_bucket{route="a/\\"b\\"/",le="10"} 1', text)
+        self.assertIn('kbackend_test_seconds_bucket{route="a/\\"b\\"/",le="+Inf"} 2', text)
+        self.assertIn('kbackend_test_seconds_sum{route="a/\\"b\\"/"} 20.007', text)
+        self.assertIn('kbackend_test_seconds_count{route="a/\\"b\\"/"} 2', text)
+
+    def test_workers_merged(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_DIR=directory), \
+                patch.object(metrics, '_counters', metrics.Counter()), patch.object(metrics, '_histograms', {}):
+            metrics.increment('test_counter', 2)
+            metrics.observe('test_seconds', 0.2)
+            # Published by another worker
+            with patch('os.getpid', return_value=-1):
+                metrics.publish()
+
+            metrics.increment('test_counter')
+            text = metrics.render()
+
+        self.assertIn('kbackend_test_counter_total 5', text)
+        self.assertIn('kbackend_test_seconds_count 2', text)
+
+    def test_gauges(self):
+        def failing_gauges():
+            raise RuntimeError()
+
+        with patch.object(metrics, '_gauges', []):
+            metrics.register_gauges(failing_gauges)
+            metrics.register_gauges(lambda: {'test_depth': 3, 'test_dropped_total': 1})
+
+            text = metrics.render()
+
+        self.assertIn('# TYPE kbackend_test_depth gauge\nkbackend_test_depth 3\n', text)
+        self.assertIn('# TYPE kbackend_test_dropped_total counter\nkbackend_test_dropped_total 1\n', text)
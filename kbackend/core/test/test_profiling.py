@@ -0,0 +1,81 @@
+import pstats
+import tempfile
+from collections import Counter
+from pathlib import Path
+from unittest.mock import patch
+
+from django.test import override_settings
+
+from core import profiling
+from core.test.testhelpers import TestCase
+from users.models import User
+
+
+class ProfilingMiddlewareTest(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.directory = Path(self.using(tempfile.TemporaryDirectory()))
+        self.using(override_settings(PROFILING_DIR=self.directory))
+        self.user = User.objects.create(username='player')
+
+    def test_requested(self):
+        response = self.client.get(f'/api/v1/users/profile/{self.user.id}/', HTTP_AUTHORIZATION=self.valid_auth, HTTP_X_PROFILE='1')
+
+        self.assertEqual(200, response.status_code)
+        self.assertTrue(response['X-Profile'].endswith('-api_v1_users_profile_int_user_id.pstats'))
+        stats = pstats.Stats(str(self.directory / response['X-Profile']))
+        self.assertTrue(any(function == 'get_profile' for _, _, function in stats.stats))
+
+    def test_requested_sample(self):
+        response = self.client.get(f'/api/v1/users/profile/{self.user.id}/', HTTP_AUTHORIZATION=self.valid_auth, HTTP_X_PROFILE='sample')
+
+        self.assertTrue(response['X-Profile'].endswith('.collapsed'))
+        self.assertTrue((self.directory / response['X-Profile']).exists())
+
+    def test_not_privileged(self):
+        response = self.client.get(f'/api/v1/users/profile/{self.user.id}/', HTTP_X_PROFILE='1')
+
+        self.assertEqual(200, response.status_code)
+        self.assertFalse(response.has_header('X-Profile'))
+        self.assertEqual([], list(self.directory.iterdir()))
+
+    @override_settings(PROFILING_SAMPLE_EVERY=3)
+    def test_sampled(self):
+        self.using(patch('core.profiling._requests', Counter()))
+        for _ in range(6):
+            response = self.client.get(f'/api/v1/users/profile/{self.user.id}/')
+            self.assertFalse(response.has_header('X-Profile'))
+
+        self.assertEqual(2, len(list(self.directory.glob('*-api_v1_users_profile_int_user_id.collapsed'))))
+
+    @override_settings(PROFILING_MAX_FILES=2)
+    def test_retention(self):
+        names = [self.client.get('/api/v1/users/autocomplete/', HTTP_AUTHORIZATION=self.valid_auth, HTTP_X_PROFILE='1')['X-Profile']
+                 for _ in range(3)]
+
+        self.assertEqual(names[1:], sorted(path.name for path in self.directory.iterdir()))
+
+
+class StackSamplerTest(TestCase):
+
+    def test_collapsed_stacks(self):
+        sampler = profiling.StackSampler(interval=0.0001)
+        sampler.start()
+        _busy_loop()
+        sampler.stop()
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'profile.collapsed'
+            sampler.write(path)
+            lines = path.read_text().splitlines()
+
+        self.assertTrue(any('test_collapsed_stacks' in line and '_busy_loop' in line for line in lines))
+        self.assertTrue(all(line.rsplit(' ', 1)[1].isdigit() for line in lines))
+
+
+def _busy_loop():
+    total = 0
+    for i in range(1000000):
+        total += i
+    return total
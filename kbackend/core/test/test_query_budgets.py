@@ -0,0 +1,254 @@
+import uuid
+
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+from django.urls import URLResolver, get_resolver
+
+from core.middleware import MetricsMiddleware
+from core.querytracking import N_PLUS_ONE_THRESHOLD, get_request_tracker, track_queries
+from core.test.testhelpers import TestCase
+from soccer.models import Match, MatchParticipation, SoccerStat
+from users.models import User, UserDetails
+
+# Most queries that each endpoint may run, per method, for the requests made by its tests with empty caches
+QUERY_BUDGETS = {
+    ('api/v1/core/csrf-token/', 'GET'): 0,
+    ('api/v1/core/metrics/', 'GET'): 0,
+    ('api/v1/users/reset-password/', 'POST'): 4,
+    ('api/v1/users/change-password/', 'POST'): 4,
+    ('api/v1/users/login/', 'POST'): 9,
+    ('api/v1/users/logout/', 'GET'): 3,
+    # The version for the ETag and the search
+    ('api/v1/users/search/', 'GET'): 2,
+    ('api/v1/users/autocomplete/', 'GET'): 1,
+    ('api/v1/users/marketplace/', 'GET'): 1,
+    ('api/v1/users/leaderboards/<str:counter>/', 'GET'): 1,
+    ('api/v1/users/profile/<int:user_id>/', 'GET'): 2,
+    ('api/v1/users/profile/<int:user_id>/', 'PATCH'): 5,
+    ('api/v1/users/profile/<int:user_id>/ranks/', 'GET'): 5,
+    ('api/v1/users/profile/<int:user_id>/matches/', 'GET'): 3,
+    ('api/v1/users/me/profile/', 'GET'): 4,
+    ('api/v1/users/test-users/', 'GET'): 1,
+    ('api/v1/users/test-users/', 'POST'): 2,
+    # A batch of stats and a single one, a batch looks up its stat_uuids before and after the INSERT
+    ('api/v1/soccer/stats/', 'POST'): 11,
+    ('api/v1/soccer/stats/buffer/', 'GET'): 0,
+    ('api/v1/soccer/matches/', 'GET'): 1,
+    ('api/v1/soccer/matches/', 'POST'): 14,
+    ('api/v1/soccer/matches/<int:match_id>/', 'GET'): 1,
+    ('api/v1/soccer/matches/<int:match_id>/summary/', 'GET'): 2,
+    ('api/v1/soccer/competitions/<str:competition>/stats/', 'GET'): 3,
+    ('test/basic-auth/', 'GET'): 0,
+}
+# Loops in the endpoints show up as counts that grow with these
+PLAYER_COUNT = 10
+STATS_PER_PLAYER = 3
+MATCH_COUNT = 3
+
+
+class QueryBudgetTest(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.password = 'password'
+        self.user = User.objects.create_user('player0', password=self.password)
+        self.players = [self.user] + [User.objects.create(username=f'player{i}', available_for_transfer=True)
+                                      for i in range(1, PLAYER_COUNT)]
+        for player in self.players:
+            UserDetails.objects.create(user=player, biography='Bio')
+
+        self.match = Match.objects.create(competition_name='league', home_team='A', away_team='B')
+        for index, player in enumerate(self.players):
+            MatchParticipation.objects.create(match=self.match, user=player, side='home' if index % 2 else 'away')
+            for _ in range(STATS_PER_PLAYER):
+                SoccerStat.objects.create(user=player, match=self.match, stat_uuid=str(uuid.uuid4()), stat_type='goal', value=1)
+
+    def test_every_view_method_has_a_budget(self):
+        self.assertEqual(sorted(QUERY_BUDGETS), sorted(_get_view_methods(get_resolver().url_patterns)))
+
+    def test_csrf_token(self):
+        self._check('api/v1/core/csrf-token/', 'GET', lambda: self.client.get('/api/v1/core/csrf-token/'))
+
+    def test_metrics(self):
+        self._check('api/v1/core/metrics/', 'GET', lambda: self.client.get('/api/v1/core/metrics/', HTTP_AUTHORIZATION=self.valid_auth))
+
+    def test_reset_password(self):
+        self._check('api/v1/users/reset-password/', 'POST', lambda: self.client.post(
+            '/api/v1/users/reset-password/', {'username': 'player1', 'uuid': self.dummy_uuid}, HTTP_AUTHORIZATION=self.valid_auth))
+
+    def test_change_password(self):
+        self.client.force_login(self.user)
+        self._check('api/v1/users/change-password/', 'POST', lambda: self.client.post(
+            '/api/v1/users/change-password/', {'old_password': self.password, 'new_password': 'new-password'}))
+
+    def test_login(self):
+        self._check('api/v1/users/login/', 'POST', lambda: self.client.post(
+            '/api/v1/users/login/', {'username': 'player0', 'password': self.password}))
+
+    def test_logout(self):
+        self.client.force_login(self.user)
+        self._check('api/v1/users/logout/', 'GET', lambda: self.client.get('/api/v1/users/logout/'))
+
+    def test_search(self):
+        self._check('api/v1/users/search/', 'GET', lambda: self.client.get('/api/v1/users/search/', {'username': 'player'}))
+
+    def test_autocomplete(self):
+        self._check('api/v1/users/autocomplete/', 'GET', lambda: self.client.get('/api/v1/users/autocomplete/', {'prefix': 'play'}))
+
+    def test_marketplace(self):
+        self._check('api/v1/users/marketplace/', 'GET', lambda: self.client.get('/api/v1/users/marketplace/', {'sort': 'goals'}))
+
+    def test_leaderboard(self):
+        self._check('api/v1/users/leaderboards/<str:counter>/', 'GET', lambda: self.client.get('/api/v1/users/leaderboards/goals/'))
+
+    def test_profile(self):
+        self._check('api/v1/users/profile/<int:user_id>/', 'GET', lambda: self.client.get(f'/api/v1/users/profile/{self.user.id}/'))
+
+    def test_edit_profile(self):
+        self.client.force_login(self.user)
+        self._check('api/v1/users/profile/<int:user_id>/', 'PATCH', lambda: self.client.patch(
+            f'/api/v1/users/profile/{self.user.id}/', {'introduction': 'Hello'}, content_type='application/json'))
+
+    def test_ranks(self):
+        self._check('api/v1/users/profile/<int:user_id>/ranks/', 'GET',
+                    lambda: self.client.get(f'/api/v1/users/profile/{self.user.id}/ranks/'))
+
+    def test_player_matches(self):
+        self._check('api/v1/users/profile/<int:user_id>/matches/', 'GET',
+                    lambda: self.client.get(f'/api/v1/users/profile/{self.user.id}/matches/'))
+
+    def test_private_profile(self):
+        self.client.force_login(self.user)
+        self._check('api/v1/users/me/profile/', 'GET', lambda: self.client.get('/api/v1/users/me/profile/'))
+
+    def test_list_test_users(self):
+        self._check('api/v1/users/test-users/', 'GET', lambda: self.client.get('/api/v1/users/test-users/', HTTP_AUTHORIZATION=self.valid_auth))
+
+    def test_create_test_user(self):
+        self._check('api/v1/users/test-users/', 'POST', lambda: self.client.post('/api/v1/users/test-users/', HTTP_AUTHORIZATION=self.valid_auth))
+
+    def test_stats(self):
+        stats = [{'username': f'Player {i}', 'stat_uuid': str(uuid.uuid4()), 'stat_type': 'goal', 'value': 1,
+                  'match_id': self.match.id, 'side': 'home'} for i in range(PLAYER_COUNT)]
+        self._check('api/v1/soccer/stats/', 'POST', lambda: self.client.post(
+            '/api/v1/soccer/stats/', stats, content_type='application/json', HTTP_AUTHORIZATION=self.valid_auth))
+
+    def test_single_stat(self):
+        stat = {'username': 'Player 0', 'stat_uuid': str(uuid.uuid4()), 'stat_type': 'goal', 'value': 1, 'match_id': self.match.id,
+                'side': 'home'}
+        self._check('api/v1/soccer/stats/', 'POST', lambda: self.client.post(
+            '/api/v1/soccer/stats/', stat, content_type='application/json', HTTP_AUTHORIZATION=self.valid_auth))
+
+    def test_stat_buffer(self):
+        self._check('api/v1/soccer/stats/buffer/', 'GET',
+                    lambda: self.client.get('/api/v1/soccer/stats/buffer/', HTTP_AUTHORIZATION=self.valid_auth))
+
+    def test_list_matches(self):
+        for _ in range(1, MATCH_COUNT):
+            Match.objects.create(competition_name='league', home_team='A', away_team='B')
+        self._check('api/v1/soccer/matches/', 'GET', lambda: self.client.get('/api/v1/soccer/matches/'))
+
+    def test_create_match(self):
+        data = {'home_team': 'A', 'away_team': 'B', 'competition': 'league',
+                'home_players': [f'Home {i}' for i in range(PLAYER_COUNT)], 'away_players': [f'Away {i}' for i in range(PLAYER_COUNT)]}
+        self._check('api/v1/soccer/matches/', 'POST', lambda: self.client.post(
+            '/api/v1/soccer/matches/', data, content_type='application/json', HTTP_AUTHORIZATION=self.valid_auth))
+
+    def test_match_detail(self):
+        self._check('api/v1/soccer/matches/<int:match_id>/', 'GET', lambda: self.client.get(f'/api/v1/soccer/matches/{self.match.id}/'))
+
+    def test_match_summary(self):
+        self._check('api/v1/soccer/matches/<int:match_id>/summary/', 'GET',
+                    lambda: self.client.get(f'/api/v1/soccer/matches/{self.match.id}/summary/'))
+
+    def test_competition_stats(self):
+        self._check('api/v1/soccer/competitions/<str:competition>/stats/', 'GET',
+                    lambda: self.client.get('/api/v1/soccer/competitions/league/stats/'))
+
+    def test_basic_auth(self):
+        self._check('test/basic-auth/', 'GET', lambda: self.client.get('/test/basic-auth/', HTTP_AUTHORIZATION=self.valid_auth))
+
+    def _check(self, route, method, request):
+        with self.assertQueryBudget(QUERY_BUDGETS[route, method]):
+            response = request()
+        self.assertLess(response.status_code, 300, response.content)
+
+
+class QueryTrackingTest(TestCase):
+
+    def test_repeated_statements(self):
+        users = [User.objects.create(username=f'player{i}') for i in range(N_PLUS_ONE_THRESHOLD)]
+
+        with track_queries() as tracker:
+            User.objects.filter(username='player0').first()
+            for user in users:
+                user.user_details.first()
+
+        self.assertEqual(N_PLUS_ONE_THRESHOLD + 1, tracker.count)
+        self.assertEqual([N_PLUS_ONE_THRESHOLD], list(tracker.get_repeated().values()))
+        self.assertIn('users_userdetails', list(tracker.get_repeated())[0])
+
+    def test_repeated_statements_logged(self):
+        logger = self.patch('core.querytracking.logger')
+        user = User.objects.create(username='player')
+
+        def get_response(request):
+            for _ in range(N_PLUS_ONE_THRESHOLD):
+                user.user_details.first()
+            return HttpResponse()
+
+        MetricsMiddleware(get_response)(RequestFactory().get('/'))
+
+        logger.warning.assert_called_once()
+        self.assertEqual('n_plus_one_suspect', logger.warning.call_args[0][0]['event'])
+
+    def test_request_inside_execute_wrapper(self):
+        user = User.objects.create(username='player')
+
+        def get_response(request):
+            user.user_details.first()
+            return HttpResponse()
+
+        with connection.execute_wrapper(lambda execute, *args: execute(*args)):
+            MetricsMiddleware(get_response)(RequestFactory().get('/'))
+        self.assertEqual([], connection.execute_wrappers)
+
+        MetricsMiddleware(get_response)(RequestFactory().get('/'))
+        self.assertEqual(1, get_request_tracker().count)
+
+    @override_settings(SLOW_QUERY_THRESHOLD=0)
+    def test_slow_query_logged(self):
+        logger = self.patch('core.querytracking.slow_query_logger')
+        User.objects.create(username='player')
+
+        self.client.get('/api/v1/users/search/', {'username': 'player'})
+
+        entries = [call[0][0] for call in logger.warning.call_args_list]
+        self.assertTrue(entries)
+        entry = next(entry for entry in entries if 'LIKE' in entry['sql'])
+        self.assertEqual('api/v1/users/search/', entry['route'])
+        self.assertIn('<str>', entry['params'])
+        self.assertNotIn('%player%', entry['params'])
+        self.assertTrue(any(frame.startswith('users/views.py:') for frame in entry['stack']))
+
+    def test_fast_query_not_logged(self):
+        logger = self.patch('core.querytracking.slow_query_logger')
+
+        self.client.get('/api/v1/users/search/', {'username': 'player'})
+
+        logger.warning.assert_not_called()
+
+
+def _get_view_methods(patterns, prefix=''):
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            # Served by Django
+            if str(pattern.pattern) != 'adminsite/':
+                yield from _get_view_methods(pattern.url_patterns, prefix + str(pattern.pattern))
+            continue
+        view_class = pattern.callback.view_class
+        for method in view_class.http_method_names:
+            # OPTIONS is answered by APIView itself
+            if method != 'options' and hasattr(view_class, method):
+                yield prefix + str(pattern.pattern), method.upper()
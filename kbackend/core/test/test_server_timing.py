@@ -0,0 +1,39 @@
+from soccer.models import Match
+from core.test.testhelpers import TestCase
+from users.models import User
+
+
+class ServerTimingTest(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        Match.objects.create(home_team='A', away_team='B')
+
+    def test_server(self):
+        response = self.client.get('/api/v1/soccer/matches/', HTTP_AUTHORIZATION=self.valid_auth, HTTP_X_SERVER_TIMING='1')
+
+        self.assertEqual(200, response.status_code)
+        phases = [metric.split(';')[0] for metric in response['Server-Timing'].split(', ')]
+        self.assertEqual(['auth', 'serialize', 'render', 'db', 'total'], phases)
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn(';desc="1 queries"', response['Server-Timing'])
+
+    def test_staff(self):
+        self.client.force_login(User.objects.create(username='admin', is_staff=True))
+
+        response = self.client.get('/api/v1/soccer/matches/', HTTP_X_SERVER_TIMING='1')
+
+        self.assertIn('total;dur=', response['Server-Timing'])
+
+    def test_not_asked(self):
+        response = self.client.get('/api/v1/soccer/matches/', HTTP_AUTHORIZATION=self.valid_auth)
+
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    def test_user(self):
+        self.client.force_login(User.objects.create(username='player'))
+
+        response = self.client.get('/api/v1/soccer/matches/', HTTP_X_SERVER_TIMING='1')
+
+        self.assertEqual(200, response.status_code)
+        self.assertFalse(response.has_header('Server-Timing'))
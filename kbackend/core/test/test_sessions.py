@@ -0,0 +1,29 @@
+from django.core.cache import caches
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from core.test.testhelpers import TestCase
+from users.models import User
+
+
+class CachedSessionTest(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        caches['sessions'].clear()
+        self.user = User.objects.create_user('john.smith', uuid=self.dummy_uuid, password='abcdef')
+        self.client.force_login(self.user)
+
+    def test_session_read_from_cache(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/users/me/profile/')
+
+        self.assertEqual(200, response.status_code)
+        self.assertFalse([query for query in queries if 'django_session' in query['sql']])
+
+    def test_survives_cache_flush(self):
+        caches['sessions'].clear()
+
+        response = self.client.get('/api/v1/users/me/profile/')
+
+        self.assertEqual(200, response.status_code)
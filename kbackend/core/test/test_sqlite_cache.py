@@ -0,0 +1,121 @@
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import time
+from unittest.mock import patch
+
+from core.sqlite_cache import SQLiteCache
+from core.test.testhelpers import TestCase
+
+
+def _increment(path, count):
+    cache = SQLiteCache(path, {})
+    for _ in range(count):
+        cache.incr('counter')
+
+
+class SQLiteCacheTestCase(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        tmp_dir = self.using(tempfile.TemporaryDirectory())
+        self.path = os.path.join(tmp_dir, 'cache.sqlite3')
+        self.cache = SQLiteCache(self.path, {})
+
+    def test_set_and_get(self):
+        self.cache.set('key', {'value': [1, 2]})
+        self.cache.set('number', 5)
+
+        self.assertEqual({'value': [1, 2]}, self.cache.get('key'))
+        self.assertEqual(5, self.cache.get('number'))
+        self.assertEqual('default', self.cache.get('missing', 'default'))
+
+    def test_shared_between_instances(self):
+        self.cache.set('key', 'value')
+
+        self.assertEqual('value', SQLiteCache(self.path, {}).get('key'))
+
+    def test_expired(self):
+        self.cache.set('key', 'value', timeout=10)
+
+        with patch('time.time', return_value=time.time() + 11):
+            self.assertIsNone(self.cache.get('key'))
+            self.assertTrue(self.cache.add('key', 'new value'))
+        self.assertEqual('new value', self.cache.get('key'))
+
+    def test_add(self):
+        self.assertTrue(self.cache.add('key', 'value'))
+        self.assertFalse(self.cache.add('key', 'other value'))
+
+        self.assertEqual('value', self.cache.get('key'))
+
+    def test_incr(self):
+        self.cache.set('counter', 1)
+
+        self.assertEqual(3, self.cache.incr('counter', 2))
+        self.assertEqual(2, self.cache.decr('counter'))
+        self.assertRaises(ValueError, lambda: self.cache.incr('missing'))
+
+    def test_incr_from_processes(self):
+        self.cache.set('counter', 0)
+
+        processes = [multiprocessing.get_context('fork').Process(target=_increment, args=(self.path, 50)) for _ in range(3)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+
+        self.assertEqual(150, self.cache.get('counter'))
+
+    def test_many(self):
+        self.cache.set_many({'a': 1, 'b': 'two'})
+
+        self.assertEqual({'a': 1, 'b': 'two'}, self.cache.get_many(['a', 'b', 'c']))
+
+        self.cache.delete_many(['a', 'b'])
+        self.assertEqual({}, self.cache.get_many(['a', 'b']))
+
+    def test_delete_and_clear(self):
+        self.cache.set('a', 1)
+        self.cache.set('b', 2)
+
+        self.assertTrue(self.cache.delete('a'))
+        self.assertFalse(self.cache.has_key('a'))
+
+        self.cache.clear()
+        self.assertIsNone(self.cache.get('b'))
+
+    def test_delete_and_clear_failed(self):
+        self.cache.set('a', 1)
+
+        # A locked or full file is logged rather than failing the request
+        with patch.object(SQLiteCache, '_transaction', side_effect=sqlite3.OperationalError('database is locked')):
+            self.assertFalse(self.cache.delete('a'))
+            self.cache.delete_many(['a'])
+            self.cache.clear()
+
+        self.assertEqual(1, self.cache.get('a'))
+
+    def test_culled(self):
+        cache = SQLiteCache(self.path, {'OPTIONS': {'MAX_ENTRIES': 10, 'CULL_FREQUENCY': 2}})
+
+        with patch('core.sqlite_cache.CULL_EVERY', 1):
+            for i in range(12):
+                cache.set(f'key{i}', i)
+
+        self.assertLessEqual(len(cache.get_many([f'key{i}' for i in range(12)])), 10)
+
+    def test_max_size(self):
+        cache = SQLiteCache(self.path, {'OPTIONS': {'MAX_SIZE': 256 * 1024}})
+        value = os.urandom(32 * 1024)
+
+        # Writes that do not fit are misses rather than errors, and make room for the next ones
+        for i in range(20):
+            cache.set(f'key{i}', value)
+
+        self.assertLessEqual(os.path.getsize(self.path), 256 * 1024)
+        self.assertLess(len(cache.get_many([f'key{i}' for i in range(20)])), 20)
+        cache.set('after', value)
+        self.assertEqual(value, cache.get('after'))
+        self.assertFalse(cache.add('large', os.urandom(512 * 1024)))
@@ -0,0 +1,51 @@
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import call_command
+
+from core.test.testhelpers import TestCase
+from core.management.commands.summarize_slow_queries import normalize
+
+
+def _log_line(duration_ms, sql, route='api/v1/users/search/', stack=('users/views.py:150 search',)):
+    entry = {'event': 'slow_query', 'duration_ms': duration_ms, 'route': route, 'sql': sql, 'params': [1], 'stack': list(stack)}
+    return f'2026-10-18 12:00:00,000 - core.slow_queries - WARNING - {entry}\n'
+
+
+class SummarizeSlowQueriesTest(TestCase):
+
+    def test_summary(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'slow_queries.log'
+            path.write_text(
+                _log_line(100, 'SELECT * FROM users_user WHERE id IN (%s, %s)') +
+                _log_line(300, 'SELECT * FROM users_user WHERE id IN (%s)', route='api/v1/users/marketplace/') +
+                _log_line(150, 'SELECT COUNT(*) FROM soccer_match', route=None) +
+                'not a log line\n')
+            out = StringIO()
+            call_command('summarize_slow_queries', str(path), stdout=out)
+
+        lines = out.getvalue().splitlines()
+        self.assertEqual('2 queries, total 400 ms, mean 200 ms, max 300 ms', lines[0])
+        self.assertEqual('  SELECT * FROM users_user WHERE id IN (...)', lines[1])
+        self.assertEqual('  Routes: api/v1/users/search/ (1), api/v1/users/marketplace/ (1)', lines[2])
+        self.assertEqual('  Called from: users/views.py:150 search', lines[3])
+        self.assertEqual('1 queries, total 150 ms, mean 150 ms, max 150 ms', lines[4])
+        self.assertEqual('  Routes: outside of a request (1)', lines[6])
+
+    def test_no_slow_queries(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'slow_queries.log'
+            path.write_text('')
+            out = StringIO()
+            call_command('summarize_slow_queries', str(path), stdout=out)
+
+        self.assertEqual('No slow queries\n', out.getvalue())
+
+    def test_normalize(self):
+        self.assertEqual('INSERT INTO "soccer_boxscore" ("match_id", "user_id") SELECT ... UNION ALL ...',
+                         normalize('INSERT INTO "soccer_boxscore" ("match_id", "user_id") SELECT %s, %s UNION ALL SELECT %s, %s'))
+        self.assertEqual('INSERT INTO "users_user" ("id") VALUES (...)', normalize('INSERT INTO "users_user" ("id") VALUES (%s), (%s)'))
+        self.assertEqual('SAVEPOINT "s?"', normalize('SAVEPOINT "s140684875660160_x34"'))
+        self.assertEqual('SELECT ? FROM t WHERE a = ? LIMIT ?', normalize("SELECT 1 FROM t\n WHERE a = 'it''s'  LIMIT 21"))
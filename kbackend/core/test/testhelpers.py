@@ -1,9 +1,15 @@
 import logging
+from contextlib import contextmanager
 from unittest.mock import Mock, patch, DEFAULT
 
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
 from django.test import TestCase as DjangoTestCase
 from base64 import b64encode
 
+from core.cache import local_cache
+from core.querytracking import track_queries
+
 
 class TestCase(DjangoTestCase):
 
@@ -17,10 +23,12 @@ class TestCase(DjangoTestCase):
     def setUp(self):
         super().setUp()
         logging.disable(logging.CRITICAL)
+        cache.clear()
+        local_cache.clear()
 
     def using(self, context_manager):
         enter_value = context_manager.__enter__()
-        self.addCleanup(context_manager.__exit__)
+        self.addCleanup(context_manager.__exit__, None, None, None)
         return enter_value
 
     def patch(self, target, new=DEFAULT, spec=None, create=False, mocksignature=False, spec_set=None, autospec=False, new_callable=None, **kwargs):
@@ -29,3 +37,23 @@ class TestCase(DjangoTestCase):
     def assertAllEqual(self, first, second, third, msg=None):
         self.assertEqual(first, second, msg=msg)
         self.assertEqual(first, third, msg=msg)
+
+    @contextmanager
+    def assertQueryBudget(self, budget):
+        """ Fails when the block runs more than budget queries, the message lists the statements that ran """
+        with track_queries() as tracker:
+            yield tracker
+        if tracker.count > budget:
+            statements = '\n'.join(f'{count} x {sql}' for sql, count in tracker.statements.most_common())
+            self.fail(f'{tracker.count} queries ran, the budget is {budget}:\n{statements}')
+
+    @contextmanager
+    def runOnCommitCallbacks(self, using=DEFAULT_DB_ALIAS):
+        """ Runs the transaction.on_commit callbacks of the block, the transaction of the test is never committed """
+        connection = connections[using]
+        start = len(connection.run_on_commit)
+        yield
+        callbacks = connection.run_on_commit[start:]
+        del connection.run_on_commit[start:]
+        for _, callback in callbacks:
+            callback()
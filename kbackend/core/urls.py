@@ -27,6 +27,7 @@ admin.site.login = login_wrapper(admin.site.login)
 urlpatterns = [
     path('adminsite/', admin.site.urls),
     path('api/v1/core/csrf-token/', views.CsrfView.as_view()),
+    path('api/v1/core/metrics/', views.MetricsView.as_view()),
     path('api/v1/users/', include('users.urls')),
     path('api/v1/soccer/', include('soccer.urls')),
 ]
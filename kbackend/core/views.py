@@ -1,3 +1,4 @@
+from django.http import HttpResponse
 from django.views.decorators.csrf import ensure_csrf_cookie
 from django.utils.decorators import method_decorator
 from rest_framework.permissions import IsAuthenticated
@@ -5,6 +6,7 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from core.basic_auth import ServerBasicAuthentication
+from core import metrics
 
 
 class CsrfView(APIView):
@@ -14,6 +16,15 @@ class CsrfView(APIView):
         return Response({"csrftoken": request.META['CSRF_COOKIE']})
 
 
+class MetricsView(APIView):
+
+    authentication_classes = [ServerBasicAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
 class BasicAuthTestView(APIView):
 
     authentication_classes = [ServerBasicAuthentication]
@@ -2,3 +2,9 @@
 import gunicorn
 
 gunicorn.SERVER_SOFTWARE = 'undisclosed'
+
+
+def post_worker_init(worker):
+    from soccer.stat_buffer import start_flusher
+
+    start_flusher()
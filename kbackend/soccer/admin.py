@@ -1,5 +1,5 @@
 from django.contrib import admin
-from soccer.models import Match, MatchParticipation, SoccerStat
+from soccer.models import BoxScore, Match, MatchParticipation, SoccerStat
 
 
 class MatchAdmin(admin.ModelAdmin):
@@ -14,6 +14,11 @@ class SoccerStatAdmin(admin.ModelAdmin):
     pass
 
 
+class BoxScoreAdmin(admin.ModelAdmin):
+    pass
+
+
 admin.site.register(Match, MatchAdmin)
 admin.site.register(MatchParticipation, MatchParticipationAdmin)
 admin.site.register(SoccerStat, SoccerStatAdmin)
+admin.site.register(BoxScore, BoxScoreAdmin)
@@ -3,3 +3,9 @@ from django.apps import AppConfig
 
 class SoccerConfig(AppConfig):
     name = 'soccer'
+
+    def ready(self):
+        from core import metrics
+        from soccer.stat_buffer import get_gauges
+
+        metrics.register_gauges(get_gauges)
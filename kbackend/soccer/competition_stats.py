@@ -0,0 +1,57 @@
+import hashlib
+
+from django.db.models import Q, Sum
+from django.db.models.functions import Coalesce
+
+from core.cache import TieredCache
+from soccer.models import Match, SoccerStat
+
+# Stat types that are totalled per competition, mapped to the name of the total
+COMPETITION_STAT_FIELDS = {
+    'goal': 'goals',
+    'assist': 'assists',
+    'yellow': 'yellow_cards',
+    'red': 'red_cards',
+}
+TOP_SCORERS_SIZE = 10
+# Backstop for version bumps that are lost between workers, seconds
+COMPETITION_STATS_TIMEOUT = 5 * 60
+
+
+def get_competition_stats(competition):
+    """ Totals and top scorers of the competition, cached until a stat or a match is recorded for it """
+    return _stats_cache(competition).get_or_set('totals', lambda: _aggregate(competition))
+
+
+def invalidate_competition_stats(competitions):
+    for competition in set(competitions):
+        if not competition:
+            continue
+        _stats_cache(competition).invalidate()
+
+
+def _aggregate(competition):
+    totals = {name: Coalesce(Sum('value', filter=Q(stat_type=stat_type)), 0)
+              for stat_type, name in COMPETITION_STAT_FIELDS.items()}
+    players = list(SoccerStat.objects.filter(match__competition_name=competition)
+                   .values('user_id', 'user__username', 'user__display_name', 'user__is_test')
+                   .annotate(**totals).order_by())
+
+    scorers = [player for player in players if player['goals'] > 0 and not player['user__is_test']]
+    scorers.sort(key=lambda player: (-player['goals'], -player['assists'], player['user_id']))
+
+    stats = {'competition': competition, 'matches': Match.objects.filter(competition_name=competition).count()}
+    for name in COMPETITION_STAT_FIELDS.values():
+        stats[name] = sum(player[name] for player in players)
+    stats['top_scorers'] = [_to_scorer(player) for player in scorers[:TOP_SCORERS_SIZE]]
+    return stats
+
+
+def _to_scorer(player):
+    return {'id': player['user_id'], 'username': player['user__username'], 'display_name': player['user__display_name'],
+            'goals': player['goals'], 'assists': player['assists']}
+
+
+def _stats_cache(competition):
+    # Competition names are free text, hashing them keeps the cache keys valid
+    return TieredCache(f'competition_stats:{hashlib.md5(competition.encode()).hexdigest()}', COMPETITION_STATS_TIMEOUT)
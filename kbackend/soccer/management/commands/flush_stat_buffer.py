@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from soccer.stat_buffer import get_stat_buffer
+
+
+class Command(BaseCommand):
+    help = 'Write the stats queued in the stat buffer to the database'
+
+    def handle(self, *args, **options):
+        flushed = get_stat_buffer().flush()
+        self.stdout.write(f'Flushed {flushed} stats')
@@ -0,0 +1,28 @@
+# Generated by Django 3.1.1 on 2026-10-18 10:05
+
+from django.db import migrations, models
+
+
+def delete_duplicate_stats(apps, schema_editor):
+    SoccerStat = apps.get_model('soccer', 'SoccerStat')
+    duplicate_uuids = (SoccerStat.objects.values('stat_uuid')
+                       .annotate(count=models.Count('id'), first_id=models.Min('id'))
+                       .filter(count__gt=1))
+    for duplicate in duplicate_uuids:
+        SoccerStat.objects.filter(stat_uuid=duplicate['stat_uuid']).exclude(id=duplicate['first_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('soccer', '0005_auto_20200917_0626'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_duplicate_stats, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='soccerstat',
+            name='stat_uuid',
+            field=models.CharField(max_length=36, unique=True),
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 3.1.1 on 2026-10-18 10:08
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+BOX_SCORE_FIELDS = {
+    'goal': 'goals',
+    'assist': 'assists',
+    'yellow': 'yellow_cards',
+    'red': 'red_cards',
+    'sub off': 'subs_off',
+    'sub on': 'subs_on',
+}
+
+
+def create_box_scores(apps, schema_editor):
+    BoxScore = apps.get_model('soccer', 'BoxScore')
+    MatchParticipation = apps.get_model('soccer', 'MatchParticipation')
+    SoccerStat = apps.get_model('soccer', 'SoccerStat')
+
+    box_scores = {}
+    for participation in MatchParticipation.objects.filter(match__isnull=False).values('match_id', 'user_id', 'side'):
+        key = (participation['match_id'], participation['user_id'], participation['side'])
+        box_scores[key] = BoxScore(match_id=key[0], user_id=key[1], side=key[2])
+
+    stat_totals = (SoccerStat.objects.filter(match__isnull=False, stat_type__in=BOX_SCORE_FIELDS.keys())
+                   .values('match_id', 'user_id', 'side', 'stat_type').annotate(total=models.Sum('value')))
+    for total in stat_totals:
+        key = (total['match_id'], total['user_id'], total['side'])
+        box_score = box_scores.setdefault(key, BoxScore(match_id=key[0], user_id=key[1], side=key[2]))
+        setattr(box_score, BOX_SCORE_FIELDS[total['stat_type']], total['total'])
+
+    BoxScore.objects.bulk_create(box_scores.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('soccer', '0006_unique_stat_uuid'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BoxScore',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('side', models.CharField(blank=True, choices=[('home', 'Home'), ('away', 'Away')], max_length=4)),
+                ('goals', models.IntegerField(default=0)),
+                ('assists', models.IntegerField(default=0)),
+                ('yellow_cards', models.IntegerField(default=0)),
+                ('red_cards', models.IntegerField(default=0)),
+                ('subs_off', models.IntegerField(default=0)),
+                ('subs_on', models.IntegerField(default=0)),
+                ('match', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='box_scores', to='soccer.match')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='boxscore',
+            constraint=models.UniqueConstraint(fields=('match', 'user', 'side'), name='unique_box_score'),
+        ),
+        migrations.RunPython(create_box_scores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 3.1.1 on 2026-10-18 10:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('soccer', '0007_boxscore'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='match',
+            index=models.Index(fields=['-created_at', '-id'], name='match_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='match',
+            index=models.Index(fields=['competition_name', '-created_at', '-id'], name='match_competition_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='match',
+            index=models.Index(fields=['home_team', '-created_at', '-id'], name='match_home_team_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='match',
+            index=models.Index(fields=['away_team', '-created_at', '-id'], name='match_away_team_idx'),
+        ),
+    ]
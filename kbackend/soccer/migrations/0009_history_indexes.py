@@ -0,0 +1,21 @@
+# Generated by Django 3.1.1 on 2026-10-18 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('soccer', '0008_match_list_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='matchparticipation',
+            index=models.Index(fields=['user', 'match'], name='participation_user_match_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='soccerstat',
+            index=models.Index(fields=['user', 'match'], name='stat_user_match_idx'),
+        ),
+    ]
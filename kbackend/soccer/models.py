@@ -1,6 +1,10 @@
-from django.db import models
+from collections import defaultdict
+
+from django.db import models, connections, transaction
 from django.conf import settings
 
+from core.helpers import bulk_increment
+
 SOCCER_STAT_TYPES = [
     ('goal', 'Goal'),
     ('assist', 'Assist'),
@@ -16,6 +20,16 @@ MATCH_SIDES = [
     ('away', 'Away'),
 ]
 
+# Stat types that are counted in the box score, mapped to the BoxScore field
+BOX_SCORE_FIELDS = {
+    'goal': 'goals',
+    'assist': 'assists',
+    'yellow': 'yellow_cards',
+    'red': 'red_cards',
+    'sub off': 'subs_off',
+    'sub on': 'subs_on',
+}
+
 
 class Match(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
@@ -27,6 +41,13 @@ class Match(models.Model):
 
     class Meta:
         verbose_name_plural = 'Matches'
+        # Keyset pagination of the match list, newest first
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='match_created_idx'),
+            models.Index(fields=['competition_name', '-created_at', '-id'], name='match_competition_idx'),
+            models.Index(fields=['home_team', '-created_at', '-id'], name='match_home_team_idx'),
+            models.Index(fields=['away_team', '-created_at', '-id'], name='match_away_team_idx'),
+        ]
 
 
 class ParticipationManager(models.Manager):
@@ -44,10 +65,77 @@ class MatchParticipation(models.Model):
     match = models.ForeignKey(Match, null=True, on_delete=models.CASCADE)
     side = models.CharField(max_length=4, blank=True, choices=MATCH_SIDES)
 
+    class Meta:
+        # Match history of a player
+        indexes = [
+            models.Index(fields=['user', 'match'], name='participation_user_match_idx'),
+        ]
+
+
+class SoccerStatManager(models.Manager):
+
+    def insert_ignore_conflicts(self, stats):
+        """ Insert the stats with ON CONFLICT DO NOTHING and return the ones that were created """
+        connection = connections[self.db]
+        fields = [field for field in self.model._meta.concrete_fields if not field.primary_key]
+        batch_size = max(connection.ops.bulk_batch_size(fields, stats), 1)
+
+        created = []
+        with transaction.atomic(using=self.db, savepoint=False):
+            for start in range(0, len(stats), batch_size):
+                created += self._insert_batch(connection, fields, stats[start:start + batch_size])
+
+        for stat in created:
+            stat._state.adding = False
+            stat._state.db = self.db
+        return created
+
+    def _insert_batch(self, connection, fields, stats):
+        quote_name = connection.ops.quote_name
+        rows = [[field.get_db_prep_save(field.pre_save(stat, True), connection) for field in fields] for stat in stats]
+        row_placeholder = '({})'.format(', '.join(['%s'] * len(fields)))
+        sql = 'INSERT INTO {} ({}) VALUES {} ON CONFLICT ({}) DO NOTHING'.format(
+            quote_name(self.model._meta.db_table),
+            ', '.join(quote_name(field.column) for field in fields),
+            ', '.join([row_placeholder] * len(rows)),
+            quote_name('stat_uuid'))
+        params = [value for row in rows for value in row]
+
+        with connection.cursor() as cursor:
+            if connection.features.can_return_rows_from_bulk_insert:
+                cursor.execute(f'{sql} RETURNING {quote_name("id")}, {quote_name("stat_uuid")}', params)
+                created_ids = cursor.fetchall()
+            elif len(stats) == 1:
+                cursor.execute(sql, params)
+                created_ids = [(cursor.lastrowid, stats[0].stat_uuid)] if cursor.rowcount == 1 else []
+            else:
+                uuids = {stat.stat_uuid for stat in stats}
+                existing_uuids = set(self.filter(stat_uuid__in=uuids).values_list('stat_uuid', flat=True))
+                cursor.execute(sql, params)
+                created_ids = self._get_created_ids(uuids - existing_uuids) if cursor.rowcount else []
+
+        stats_by_uuid = {}
+        for stat in stats:
+            stats_by_uuid.setdefault(stat.stat_uuid, stat)
+
+        created = []
+        for stat_id, stat_uuid in created_ids:
+            stat = stats_by_uuid[stat_uuid]
+            stat.id = stat_id
+            created.append(stat)
+        return created
+
+    def _get_created_ids(self, new_uuids):
+        # Without RETURNING, the rows that were not there before the INSERT are the created ones. Both queries run
+        # in the transaction of the INSERT, no other writer can add a row in between
+        return list(self.filter(stat_uuid__in=new_uuids).values_list('id', 'stat_uuid'))
+
 
 class SoccerStat(models.Model):
+    objects = SoccerStatManager()
+
     created_at = models.DateTimeField(auto_now_add=True)
-    stat_uuid = models.CharField(max_length=36, db_index=True)
+    stat_uuid = models.CharField(max_length=36, unique=True)
 
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
 
@@ -55,3 +143,50 @@ class SoccerStat(models.Model):
     value = models.IntegerField()
     match = models.ForeignKey(Match, null=True, on_delete=models.CASCADE)
     side = models.CharField(max_length=4, blank=True, choices=MATCH_SIDES)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'match'], name='stat_user_match_idx'),
+        ]
+
+
+class BoxScoreManager(models.Manager):
+
+    def bulk_create_team(self, match, users, side):
+        box_scores = [BoxScore(user=user, match=match, side=side) for user in users]
+        self.bulk_create(box_scores, ignore_conflicts=True)
+
+    def add_stats(self, stats):
+        deltas = defaultdict(lambda: defaultdict(int))
+        for stat in stats:
+            field = BOX_SCORE_FIELDS.get(stat.stat_type)
+            if field and stat.match_id is not None:
+                deltas[(stat.match_id, stat.user_id, stat.side)][field] += stat.value
+
+        # Box scores are created along with the match, this only adds the ones of players who were not in the roster
+        self.bulk_create([BoxScore(match_id=match_id, user_id=user_id, side=side) for match_id, user_id, side in deltas],
+                         ignore_conflicts=True)
+
+        bulk_increment(self.all(), {(('match_id', match_id), ('user_id', user_id), ('side', side)): box_score_deltas
+                                    for (match_id, user_id, side), box_score_deltas in deltas.items()})
+
+
+class BoxScore(models.Model):
+    """ Stats of a player in a match, kept up to date as the stats arrive """
+    objects = BoxScoreManager()
+
+    match = models.ForeignKey(Match, on_delete=models.CASCADE, related_name='box_scores')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    side = models.CharField(max_length=4, blank=True, choices=MATCH_SIDES)
+
+    goals = models.IntegerField(default=0)
+    assists = models.IntegerField(default=0)
+    yellow_cards = models.IntegerField(default=0)
+    red_cards = models.IntegerField(default=0)
+    subs_off = models.IntegerField(default=0)
+    subs_on = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['match', 'user', 'side'], name='unique_box_score'),
+        ]
@@ -1,6 +1,6 @@
 from rest_framework import serializers
 
-from soccer.models import SoccerStat, Match
+from soccer.models import BoxScore, SoccerStat, Match, MatchParticipation
 
 
 class SoccerStatCreateSerializer(serializers.ModelSerializer):
@@ -8,17 +8,30 @@ class SoccerStatCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = SoccerStat
         fields = ('id', 'user', 'stat_type', 'value', 'stat_uuid', 'match', 'side')
+        # Existing stat_uuids are handled by get_or_create
+        extra_kwargs = {'stat_uuid': {'validators': []}}
 
     def get_or_create(self):
         self.is_valid(raise_exception=True)
-        uuid = self.validated_data['stat_uuid']
-        stat = SoccerStat.objects.filter(stat_uuid=uuid).first()
-        if stat:
+        stat = SoccerStat(**self.validated_data)
+        created = len(SoccerStat.objects.insert_ignore_conflicts([stat])) > 0
+        if not created:
             # Already exists
-            self.validated_data['id'] = stat.id
-            return stat, False
+            stat = SoccerStat.objects.get(stat_uuid=stat.stat_uuid)
 
-        return self.save(), True
+        self.instance = stat
+        return stat, created
+
+
+class SoccerStatBatchItemSerializer(serializers.ModelSerializer):
+    """ Validates a single item of a stat batch without querying the user or the match """
+    username = serializers.CharField(max_length=63)
+    match = serializers.IntegerField(source='match_id', required=False, allow_null=True)
+
+    class Meta:
+        model = SoccerStat
+        fields = ('username', 'stat_type', 'value', 'stat_uuid', 'match', 'side')
+        extra_kwargs = {'stat_uuid': {'validators': []}}
 
 
 class UsernamesField(serializers.ListField):
@@ -48,4 +61,40 @@ class MatchSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Match
-        fields = ('id', 'competition', 'home_team', 'away_team')
+        fields = ('id', 'competition', 'home_team', 'away_team', 'created_at')
+
+
+class RosterPlayerSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(source='user.id')
+    username = serializers.CharField(source='user.username')
+    display_name = serializers.CharField(source='user.display_name')
+
+    class Meta:
+        model = MatchParticipation
+        fields = ('id', 'username', 'display_name')
+
+
+class BoxScoreSerializer(serializers.ModelSerializer):
+    username = serializers.CharField(source='user.username')
+    display_name = serializers.CharField(source='user.display_name')
+
+    class Meta:
+        model = BoxScore
+        fields = ('user', 'username', 'display_name', 'side', 'goals', 'assists', 'yellow_cards', 'red_cards', 'subs_off', 'subs_on')
+
+
+class PlayerStatSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = SoccerStat
+        fields = ('id', 'stat_type', 'value', 'side', 'created_at')
+
+
+class PlayerMatchSerializer(serializers.ModelSerializer):
+    """ A match of a player with the stats of the player, expects match.player_stats to be prefetched """
+    match = MatchSerializer()
+    stats = PlayerStatSerializer(source='match.player_stats', many=True)
+
+    class Meta:
+        model = MatchParticipation
+        fields = ('match', 'side', 'stats')
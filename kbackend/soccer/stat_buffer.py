@@ -0,0 +1,258 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger('soccer')
+
+_buffers = {}
+_buffers_lock = threading.Lock()
+
+
+class StatBufferFull(Exception):
+    pass
+
+
+class StatBuffer:
+    """ Durable write-behind journal of posted stats, shared by all workers on the host
+
+    Stats are appended to a local SQLite file and a background thread drains them in batches
+    through SoccerStatsView.create_stats. Draining is idempotent because of the unique stat_uuid,
+    so a batch that is retried after a crash is not counted twice. A stat that fails max_attempts
+    flushes in a row is moved to the failed_stats table, so that it does not hold up the others.
+    """
+
+    def __init__(self, path, max_depth, batch_size, flush_interval, max_attempts):
+        self.path = str(path)
+        self.max_depth = max_depth
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+
+        self._local = threading.local()
+        self._flusher = None
+        self._flusher_lock = threading.Lock()
+
+        db = self._connect()
+        db.execute('CREATE TABLE IF NOT EXISTS stats (id INTEGER PRIMARY KEY AUTOINCREMENT, data TEXT NOT NULL, queued_at REAL NOT NULL)')
+        db.execute('CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value REAL NOT NULL)')
+        db.execute('CREATE TABLE IF NOT EXISTS attempts (stat_id INTEGER PRIMARY KEY, value INTEGER NOT NULL)')
+        db.execute('CREATE TABLE IF NOT EXISTS failed_stats (id INTEGER PRIMARY KEY, data TEXT NOT NULL, queued_at REAL NOT NULL, '
+                   'error TEXT NOT NULL, failed_at REAL NOT NULL)')
+
+    def append(self, items):
+        now = time.time()
+        rows = [(json.dumps(item), now) for item in items]
+
+        with self._transaction() as db:
+            if self._depth(db) + len(rows) > self.max_depth:
+                raise StatBufferFull()
+            db.executemany('INSERT INTO stats (data, queued_at) VALUES (?, ?)', rows)
+
+    def flush(self):
+        """ Drain the buffer into the database, returns the number of stats flushed """
+        lease_until = self._acquire_lease()
+        if lease_until is None:
+            return 0
+
+        flushed = 0
+        try:
+            while True:
+                count = self._flush_batch()
+                flushed += count
+                if count < self.batch_size:
+                    return flushed
+        finally:
+            self._release_lease(lease_until)
+
+    def metrics(self):
+        db = self._connect()
+        depth = self._depth(db)
+        oldest = db.execute('SELECT MIN(queued_at) FROM stats').fetchone()[0]
+        counters = dict(db.execute('SELECT name, value FROM counters'))
+        return {
+            'depth': depth,
+            'max_depth': self.max_depth,
+            'oldest_age': time.time() - oldest if oldest else 0,
+            'flushed_total': int(counters.get('flushed_total', 0)),
+            'invalid_total': int(counters.get('invalid_total', 0)),
+            'failed_flushes_total': int(counters.get('failed_flushes_total', 0)),
+            'failed_total': int(counters.get('failed_total', 0)),
+            'last_flush_at': counters.get('last_flush_at'),
+            'batch_size': self.batch_size,
+            'flush_interval': self.flush_interval,
+        }
+
+    def ensure_flusher(self):
+        if self._flusher and self._flusher.is_alive():
+            return
+        with self._flusher_lock:
+            if self._flusher and self._flusher.is_alive():
+                return
+            self._flusher = threading.Thread(target=self._run_flusher, name='stat-buffer-flusher', daemon=True)
+            self._flusher.start()
+
+    def _run_flusher(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                close_old_connections()
+                self.flush()
+            except Exception:
+                logger.exception({'event': 'stat_buffer_flush_failed'})
+            finally:
+                close_old_connections()
+
+    def _flush_batch(self):
+        db = self._connect()
+        rows = db.execute('SELECT id, data FROM stats ORDER BY id LIMIT ?', (self.batch_size,)).fetchall()
+        if not rows:
+            return 0
+
+        try:
+            results = self._create_stats([json.loads(data) for _, data in rows])
+        except Exception:
+            with self._transaction() as db:
+                self._increment(db, 'failed_flushes_total')
+            # Finds the stats that fail
+            return self._flush_one_by_one(rows)
+
+        self._delete_flushed(rows, results)
+        return len(rows)
+
+    def _flush_one_by_one(self, rows):
+        for stat_id, data in rows:
+            try:
+                results = self._create_stats([json.loads(data)])
+            except Exception as ex:
+                with self._transaction() as db:
+                    attempts = self._add_attempt(db, stat_id)
+                    if attempts >= self.max_attempts:
+                        self._move_to_failed(db, stat_id, repr(ex))
+                if attempts < self.max_attempts:
+                    # The database may be down rather than the stat broken, the stats after it wait for the next flush
+                    raise
+                logger.error({'event': 'stat_buffer_stat_failed', 'data': data, 'error': repr(ex)})
+                continue
+            self._delete_flushed([(stat_id, data)], results)
+        return len(rows)
+
+    def _delete_flushed(self, rows, results):
+        items = [json.loads(data) for _, data in rows]
+        invalid = [{'item': item, 'errors': result['errors']} for item, result in zip(items, results) if 'errors' in result]
+        for invalid_item in invalid:
+            logger.warning({'event': 'stat_buffer_invalid_stat', **invalid_item})
+
+        with self._transaction() as db:
+            db.execute('DELETE FROM stats WHERE id <= ?', (rows[-1][0],))
+            db.execute('DELETE FROM attempts WHERE stat_id <= ?', (rows[-1][0],))
+            self._increment(db, 'flushed_total', len(rows) - len(invalid))
+            self._increment(db, 'invalid_total', len(invalid))
+            db.execute("INSERT OR REPLACE INTO counters (name, value) VALUES ('last_flush_at', ?)", (time.time(),))
+
+    def _move_to_failed(self, db, stat_id, error):
+        # Kept for an operator to look into, the stats before it are flushed so the queue still shrinks from the front
+        db.execute('INSERT OR REPLACE INTO failed_stats (id, data, queued_at, error, failed_at) '
+                   'SELECT id, data, queued_at, ?, ? FROM stats WHERE id = ?', (error, time.time(), stat_id))
+        db.execute('DELETE FROM stats WHERE id = ?', (stat_id,))
+        db.execute('DELETE FROM attempts WHERE stat_id = ?', (stat_id,))
+        self._increment(db, 'failed_total')
+
+    @staticmethod
+    def _create_stats(items):
+        from soccer.views import SoccerStatsView, MAX_STAT_BATCH_SIZE
+
+        results = []
+        for start in range(0, len(items), MAX_STAT_BATCH_SIZE):
+            results += SoccerStatsView.create_stats(items[start:start + MAX_STAT_BATCH_SIZE]).data
+        return results
+
+    def _acquire_lease(self):
+        # Only one worker drains the buffer at a time, the lease expires if that worker dies
+        now = time.time()
+        lease_until = now + max(self.flush_interval * 10, 60)
+        with self._transaction() as db:
+            db.execute("INSERT OR IGNORE INTO counters (name, value) VALUES ('lease_until', 0)")
+            cursor = db.execute("UPDATE counters SET value = ? WHERE name = 'lease_until' AND value < ?", (lease_until, now))
+            return lease_until if cursor.rowcount == 1 else None
+
+    def _release_lease(self, lease_until):
+        # A flush that outlived its lease does not release the lease of the worker that took over
+        self._connect().execute("UPDATE counters SET value = 0 WHERE name = 'lease_until' AND value = ?", (lease_until,))
+
+    @contextmanager
+    def _transaction(self):
+        db = self._connect()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            yield db
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+
+    def _connect(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            # Autocommit mode, transactions are started explicitly
+            db = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=FULL')
+            self._local.db = db
+        return db
+
+    @staticmethod
+    def _depth(db):
+        # Rows are deleted from the front so the id range is the number of queued stats
+        first_id, last_id = db.execute('SELECT MIN(id), MAX(id) FROM stats').fetchone()
+        return last_id - first_id + 1 if first_id is not None else 0
+
+    @staticmethod
+    def _add_attempt(db, stat_id):
+        db.execute('INSERT OR IGNORE INTO attempts (stat_id, value) VALUES (?, 0)', (stat_id,))
+        db.execute('UPDATE attempts SET value = value + 1 WHERE stat_id = ?', (stat_id,))
+        return db.execute('SELECT value FROM attempts WHERE stat_id = ?', (stat_id,)).fetchone()[0]
+
+    @staticmethod
+    def _increment(db, name, value=1):
+        db.execute('INSERT OR IGNORE INTO counters (name, value) VALUES (?, 0)', (name,))
+        db.execute('UPDATE counters SET value = value + ? WHERE name = ?', (value, name))
+
+
+def get_stat_buffer():
+    path = str(settings.STAT_BUFFER_PATH)
+    with _buffers_lock:
+        if path not in _buffers:
+            _buffers[path] = StatBuffer(path, settings.STAT_BUFFER_MAX_DEPTH, settings.STAT_BUFFER_BATCH_SIZE,
+                                        settings.STAT_BUFFER_FLUSH_INTERVAL, settings.STAT_BUFFER_MAX_ATTEMPTS)
+        return _buffers[path]
+
+
+def get_gauges():
+    """ Metrics of the buffer of this host for core.metrics """
+    if not settings.STAT_BUFFER_ENABLED:
+        return {}
+    metrics = get_stat_buffer().metrics()
+    return {
+        'stat_buffer_depth': metrics['depth'],
+        'stat_buffer_max_depth': metrics['max_depth'],
+        'stat_buffer_oldest_age_seconds': metrics['oldest_age'],
+        'stat_buffer_batch_size': metrics['batch_size'],
+        'stat_buffer_flush_interval_seconds': metrics['flush_interval'],
+        'stat_buffer_last_flush_timestamp_seconds': metrics['last_flush_at'] or 0,
+        'stat_buffer_flushed_total': metrics['flushed_total'],
+        'stat_buffer_invalid_total': metrics['invalid_total'],
+        'stat_buffer_failed_flushes_total': metrics['failed_flushes_total'],
+        'stat_buffer_failed_total': metrics['failed_total'],
+    }
+
+
+def start_flusher():
+    """ Called when a worker starts, so that stats queued before a restart do not wait for the next post """
+    if settings.STAT_BUFFER_ENABLED:
+        get_stat_buffer().ensure_flusher()
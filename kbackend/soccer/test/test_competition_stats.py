@@ -0,0 +1,97 @@
+import uuid
+
+from core.test.testhelpers import TestCase
+from soccer.competition_stats import get_competition_stats
+from soccer.models import Match
+from soccer.views import MatchesView, SoccerStatsView
+from users.models import User
+
+
+class CompetitionStatsTestCase(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.match = MatchesView.create_match({'competition': 'Cup', 'home_team': 'A', 'away_team': 'B',
+                                               'home_players': ['Player1', 'Player2'], 'away_players': ['Player3']}).data
+        self.other_match = Match.objects.create(competition_name='League', home_team='A', away_team='B')
+        User.objects.create(username='test-1', is_test=True)
+
+        self._create_stats([('Player1', 'goal', 1), ('Player1', 'goal', 1), ('Player2', 'goal', 1),
+                            ('Player2', 'assist', 1), ('Player3', 'yellow', 1), ('test-1', 'goal', 1)])
+        SoccerStatsView.create_stats([{'username': 'Player3', 'stat_type': 'goal', 'value': 1,
+                                       'stat_uuid': 'other', 'match': self.other_match.id}])
+
+    def _create_stats(self, stats):
+        SoccerStatsView.create_stats([{'username': username, 'stat_type': stat_type, 'value': value,
+                                       'stat_uuid': str(uuid.uuid4()), 'match': self.match['id']}
+                                      for username, stat_type, value in stats])
+
+    def test_get_competition_stats(self):
+        stats = get_competition_stats('Cup')
+
+        self.assertEqual(1, stats['matches'])
+        self.assertEqual(4, stats['goals'])
+        self.assertEqual(1, stats['assists'])
+        self.assertEqual(1, stats['yellow_cards'])
+        self.assertEqual(0, stats['red_cards'])
+        self.assertEqual(['player1', 'player2'], [scorer['username'] for scorer in stats['top_scorers']])
+        self.assertEqual([2, 1], [scorer['goals'] for scorer in stats['top_scorers']])
+
+    def test_cached(self):
+        get_competition_stats('Cup')
+
+        with self.assertNumQueries(0):
+            get_competition_stats('Cup')
+
+    def test_invalidated_by_new_stat(self):
+        get_competition_stats('Cup')
+
+        self._create_stats([('Player3', 'goal', 1), ('Player3', 'goal', 1), ('Player3', 'goal', 1)])
+
+        stats = get_competition_stats('Cup')
+        self.assertEqual(7, stats['goals'])
+        self.assertEqual('player3', stats['top_scorers'][0]['username'])
+
+    def test_invalidated_by_single_stat(self):
+        get_competition_stats('Cup')
+
+        SoccerStatsView.create_stat({'username': 'Player2', 'stat_type': 'red', 'value': 1,
+                                     'stat_uuid': self.dummy_uuid, 'match': self.match['id']})
+
+        self.assertEqual(1, get_competition_stats('Cup')['red_cards'])
+
+    def test_invalidated_by_new_match(self):
+        get_competition_stats('Cup')
+
+        MatchesView.create_match({'competition': 'Cup', 'home_team': 'A', 'away_team': 'C',
+                                  'home_players': ['Player1'], 'away_players': ['Player4']})
+
+        self.assertEqual(2, get_competition_stats('Cup')['matches'])
+
+    def test_other_competition_stays_cached(self):
+        get_competition_stats('League')
+
+        self._create_stats([('Player3', 'goal', 1)])
+
+        with self.assertNumQueries(0):
+            stats = get_competition_stats('League')
+        self.assertEqual(1, stats['goals'])
+
+
+class CompetitionStatsViewTest(TestCase):
+
+    def test_get(self):
+        Match.objects.create(competition_name='Cup 2020', home_team='A', away_team='B')
+
+        response = self.client.get('/api/v1/soccer/competitions/Cup%202020/stats/')
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(1, response.data['matches'])
+
+    def test_not_found(self):
+        get_generation = self.patch('core.cache.get_generation')
+
+        response = self.client.get('/api/v1/soccer/competitions/Nope/stats/')
+
+        self.assertEqual(404, response.status_code)
+        get_generation.assert_not_called()
@@ -1,7 +1,7 @@
 from core.test.testhelpers import TestCase
 
 from users.models import User
-from soccer.models import Match, MatchParticipation
+from soccer.models import BoxScore, Match, MatchParticipation, SoccerStat
 
 
 class MatchParticipationTestCase(TestCase):
@@ -15,3 +15,87 @@ class MatchParticipationTestCase(TestCase):
 
         participations = MatchParticipation.objects.filter(match=match).all()
         self.assertEqual(set(['user1', 'user2']), set(p.user.username for p in participations))
+
+
+class InsertIgnoreConflictsTestCase(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create(username='user1')
+
+    def test_all_created(self):
+        stats = [SoccerStat(user=self.user, stat_uuid=f'uuid{i}', stat_type='goal', value=1) for i in range(3)]
+
+        # Without RETURNING, the stat_uuids that exist are looked up before and after the INSERT
+        with self.assertNumQueries(3):
+            created = SoccerStat.objects.insert_ignore_conflicts(stats)
+
+        self.assertEqual(stats, created)
+        for stat in stats:
+            self.assertEqual(stat.id, SoccerStat.objects.get(stat_uuid=stat.stat_uuid).id)
+
+    def test_some_exist(self):
+        existing_stat = SoccerStat.objects.create(user=self.user, stat_uuid='uuid1', stat_type='goal', value=1)
+        stats = [SoccerStat(user=self.user, stat_uuid=f'uuid{i}', stat_type='assist', value=1) for i in range(3)]
+
+        created = SoccerStat.objects.insert_ignore_conflicts(stats)
+
+        self.assertEqual(['uuid0', 'uuid2'], sorted(stat.stat_uuid for stat in created))
+        for stat in created:
+            self.assertEqual(stat.id, SoccerStat.objects.get(stat_uuid=stat.stat_uuid).id)
+        existing_stat.refresh_from_db()
+        self.assertEqual('goal', existing_stat.stat_type)
+        self.assertEqual(3, SoccerStat.objects.count())
+
+    def test_repeated_in_batch(self):
+        stats = [SoccerStat(user=self.user, stat_uuid=uuid, stat_type='goal', value=1) for uuid in ('uuid0', 'uuid0', 'uuid1')]
+
+        created = SoccerStat.objects.insert_ignore_conflicts(stats)
+
+        self.assertEqual(['uuid0', 'uuid1'], sorted(stat.stat_uuid for stat in created))
+        for stat in created:
+            self.assertEqual(stat.id, SoccerStat.objects.get(stat_uuid=stat.stat_uuid).id)
+
+    def test_none_created(self):
+        SoccerStat.objects.create(user=self.user, stat_uuid='uuid1', stat_type='goal', value=1)
+
+        created = SoccerStat.objects.insert_ignore_conflicts([SoccerStat(user=self.user, stat_uuid='uuid1', stat_type='goal', value=1)])
+
+        self.assertEqual([], created)
+
+    def test_more_than_a_batch(self):
+        stats = [SoccerStat(user=self.user, stat_uuid=f'uuid{i}', stat_type='goal', value=1) for i in range(500)]
+
+        created = SoccerStat.objects.insert_ignore_conflicts(stats)
+
+        self.assertEqual(500, len(created))
+        self.assertEqual(500, SoccerStat.objects.count())
+
+
+class BoxScoreTestCase(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user1 = User.objects.create(username='user1')
+        self.user2 = User.objects.create(username='user2')
+        self.match = Match.objects.create(home_team='home team', away_team='away team')
+        BoxScore.objects.bulk_create_team(self.match, [self.user1], side='home')
+
+    def test_add_stats(self):
+        stats = [
+            SoccerStat(user=self.user1, match=self.match, side='home', stat_type='goal', value=1),
+            SoccerStat(user=self.user1, match=self.match, side='home', stat_type='goal', value=1),
+            SoccerStat(user=self.user1, match=self.match, side='home', stat_type='yellow', value=1),
+            SoccerStat(user=self.user1, match=self.match, side='home', stat_type='kcoins', value=10),
+            SoccerStat(user=self.user1, side='home', stat_type='goal', value=1),
+            SoccerStat(user=self.user2, match=self.match, side='away', stat_type='assist', value=1),
+        ]
+
+        BoxScore.objects.add_stats(stats)
+
+        box_score1 = BoxScore.objects.get(match=self.match, user=self.user1)
+        self.assertEqual(2, box_score1.goals)
+        self.assertEqual(1, box_score1.yellow_cards)
+        box_score2 = BoxScore.objects.get(match=self.match, user=self.user2)
+        self.assertEqual('away', box_score2.side)
+        self.assertEqual(1, box_score2.assists)
@@ -0,0 +1,144 @@
+import os
+import tempfile
+import time
+
+from django.test import override_settings
+from rest_framework.response import Response
+
+from core import metrics
+from core.test.testhelpers import TestCase
+from soccer.models import SoccerStat
+from soccer.stat_buffer import StatBuffer, get_stat_buffer, start_flusher
+from soccer.views import SoccerStatsView
+from users.models import User
+
+
+class StatBufferTestCase(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        tmp_dir = self.using(tempfile.TemporaryDirectory())
+        self.buffer_path = os.path.join(tmp_dir, 'stat_buffer.sqlite3')
+        self.using(override_settings(STAT_BUFFER_ENABLED=True, STAT_BUFFER_PATH=self.buffer_path, STAT_BUFFER_MAX_DEPTH=3))
+        self.ensure_flusher_mock = self.patch('soccer.stat_buffer.StatBuffer.ensure_flusher')
+        self.user = User.objects.create(username='user')
+
+    def test_post_is_queued(self):
+        valid_data = {'username': 'user', 'stat_uuid': 'uuid1', 'stat_type': 'goal', 'value': 1}
+        response = self.client.post('/api/v1/soccer/stats/', valid_data,
+                                    HTTP_AUTHORIZATION=self.valid_auth, content_type='application/json')
+
+        self.assertEqual(202, response.status_code)
+        self.assertEqual(0, SoccerStat.objects.count())
+        self.ensure_flusher_mock.assert_called_once()
+
+        response = self.client.get('/api/v1/soccer/stats/buffer/', HTTP_AUTHORIZATION=self.valid_auth)
+        self.assertEqual(1, response.data['depth'])
+
+    def test_invalid_stat_is_rejected(self):
+        invalid_data = [{'username': 'user', 'stat_uuid': 'uuid1', 'stat_type': 'invalid', 'value': 1}]
+        response = self.client.post('/api/v1/soccer/stats/', invalid_data,
+                                    HTTP_AUTHORIZATION=self.valid_auth, content_type='application/json')
+
+        self.assertEqual(400, response.status_code)
+
+    def test_buffer_full(self):
+        valid_data = [{'username': 'user', 'stat_uuid': f'uuid{i}', 'stat_type': 'goal', 'value': 1} for i in range(4)]
+        response = self.client.post('/api/v1/soccer/stats/', valid_data,
+                                    HTTP_AUTHORIZATION=self.valid_auth, content_type='application/json')
+
+        self.assertEqual(503, response.status_code)
+
+    def test_flush(self):
+        stat_buffer = StatBuffer(self.buffer_path, max_depth=10, batch_size=2, flush_interval=1, max_attempts=2)
+        stat_buffer.append([{'username': 'user', 'stat_uuid': f'uuid{i}', 'stat_type': 'goal', 'value': 1} for i in range(3)])
+        stat_buffer.append([{'username': 'user', 'stat_uuid': 'uuid1', 'stat_type': 'goal', 'value': 1}])
+        stat_buffer.append([{'username': 'user', 'stat_uuid': 'uuid4', 'stat_type': 'goal', 'value': 1, 'match': 1234}])
+
+        flushed = stat_buffer.flush()
+
+        self.assertEqual(5, flushed)
+        self.assertEqual(3, SoccerStat.objects.count())
+        self.user.refresh_from_db()
+        self.assertEqual(3, self.user.goals)
+
+        metrics = stat_buffer.metrics()
+        self.assertEqual(0, metrics['depth'])
+        self.assertEqual(4, metrics['flushed_total'])
+        self.assertEqual(1, metrics['invalid_total'])
+        self.assertIsNotNone(metrics['last_flush_at'])
+
+    def test_failed_flush_keeps_stats(self):
+        stat_buffer = StatBuffer(self.buffer_path, max_depth=10, batch_size=2, flush_interval=1, max_attempts=2)
+        stat_buffer.append([{'username': 'user', 'stat_uuid': 'uuid1', 'stat_type': 'goal', 'value': 1}])
+        create_stats_mock = self.patch('soccer.views.SoccerStatsView.create_stats')
+        create_stats_mock.side_effect = RuntimeError
+
+        self.assertRaises(RuntimeError, stat_buffer.flush)
+
+        metrics = stat_buffer.metrics()
+        self.assertEqual(1, metrics['depth'])
+        self.assertEqual(1, metrics['failed_flushes_total'])
+
+    def test_failing_stat_moved_aside(self):
+        stat_buffer = StatBuffer(self.buffer_path, max_depth=10, batch_size=3, flush_interval=1, max_attempts=2)
+        stat_buffer.append([{'username': 'user', 'stat_uuid': f'uuid{i}', 'stat_type': 'goal', 'value': 1} for i in range(3)])
+        create_stats = SoccerStatsView.create_stats
+
+        def create_stats_unless_uuid1(items):
+            if any(item['stat_uuid'] == 'uuid1' for item in items):
+                raise RuntimeError()
+            return create_stats(items)
+        self.patch('soccer.views.SoccerStatsView.create_stats', side_effect=create_stats_unless_uuid1)
+
+        self.assertRaises(RuntimeError, stat_buffer.flush)
+        self.assertEqual(2, stat_buffer.metrics()['depth'])
+
+        self.assertEqual(2, stat_buffer.flush())
+
+        self.assertEqual(['uuid0', 'uuid2'], list(SoccerStat.objects.order_by('stat_uuid').values_list('stat_uuid', flat=True)))
+        metrics = stat_buffer.metrics()
+        self.assertEqual(0, metrics['depth'])
+        self.assertEqual(2, metrics['flushed_total'])
+        self.assertEqual(1, metrics['failed_total'])
+
+    def test_expired_lease_not_released(self):
+        stat_buffer = StatBuffer(self.buffer_path, max_depth=10, batch_size=2, flush_interval=1, max_attempts=2)
+        stat_buffer.append([{'username': 'user', 'stat_uuid': 'uuid1', 'stat_type': 'goal', 'value': 1}])
+        other_lease_until = time.time() + 60
+
+        def take_over_lease(items):
+            # The flush ran past its lease and another worker acquired it in the meantime
+            stat_buffer._connect().execute("UPDATE counters SET value = ? WHERE name = 'lease_until'", (other_lease_until,))
+            return Response([])
+        self.patch('soccer.views.SoccerStatsView.create_stats', side_effect=take_over_lease)
+
+        stat_buffer.flush()
+
+        lease_until = stat_buffer._connect().execute("SELECT value FROM counters WHERE name = 'lease_until'").fetchone()[0]
+        self.assertEqual(other_lease_until, lease_until)
+        self.assertEqual(0, stat_buffer.flush())
+
+    def test_exported_as_metrics(self):
+        get_stat_buffer().append([{'username': 'user', 'stat_uuid': 'uuid1', 'stat_type': 'goal', 'value': 1}])
+
+        text = metrics.render()
+
+        self.assertIn('# TYPE kbackend_stat_buffer_depth gauge\nkbackend_stat_buffer_depth 1\n', text)
+        self.assertIn('kbackend_stat_buffer_max_depth 3\n', text)
+        self.assertIn('# TYPE kbackend_stat_buffer_flushed_total counter\nkbackend_stat_buffer_flushed_total 0\n', text)
+
+    @override_settings(STAT_BUFFER_ENABLED=False)
+    def test_not_exported_when_disabled(self):
+        self.assertNotIn('stat_buffer', metrics.render())
+
+    def test_flusher_started_with_worker(self):
+        start_flusher()
+
+        self.ensure_flusher_mock.assert_called_once()
+
+    @override_settings(STAT_BUFFER_ENABLED=False)
+    def test_flusher_not_started_when_disabled(self):
+        start_flusher()
+
+        self.ensure_flusher_mock.assert_not_called()
@@ -4,7 +4,7 @@ from rest_framework.exceptions import ValidationError
 
 from core.test.testhelpers import TestCase
 from soccer.views import MatchesView, SoccerStatsView
-from soccer.models import Match, SoccerStat, MatchParticipation
+from soccer.models import BoxScore, Match, SoccerStat, MatchParticipation
 from users.models import User
 
 
@@ -33,6 +33,7 @@ class CreateStatTest(TestCase):
 
         self.user.refresh_from_db()
         self.assertEqual(1, self.user.goals)
+        self.assertEqual(1, BoxScore.objects.get(match=match, user=self.user).goals)
 
     def test_stat_already_exists(self):
         SoccerStat.objects.create(user=self.user, stat_uuid='someuuid', stat_type='goal', value=1)
@@ -49,11 +50,100 @@ class CreateStatTest(TestCase):
         self.user.refresh_from_db()
         self.assertEqual(0, self.user.goals)
 
+    def test_rolled_back(self):
+        self.patch('soccer.models.BoxScoreManager.add_stats', side_effect=RuntimeError)
+
+        # A stat is not left without its counters, or a retry would see it as already created
+        valid_data = {'username': 'user', 'stat_uuid': 'someuuid', 'stat_type': 'goal', 'value': 1}
+        self.assertRaises(RuntimeError, lambda: self.view.create_stat(valid_data))
+
+        self.assertFalse(SoccerStat.objects.exists())
+        self.user.refresh_from_db()
+        self.assertEqual(0, self.user.goals)
+
     def test_username_not_provided(self):
         invalid_data = {'stat_uuid': 'someuuid', 'stat_type': 'goal', 'value': 1}
         self.assertRaises(ValidationError, lambda: self.view.create_stat(invalid_data))
 
 
+class CreateStatsTest(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create(username='user')
+        self.view = SoccerStatsView
+
+    def test_success(self):
+        match = Match.objects.create()
+
+        valid_data = [
+            {'username': 'user', 'stat_uuid': 'uuid1', 'stat_type': 'goal', 'value': 1, 'match': match.id, 'side': 'home'},
+            {'username': 'user', 'stat_uuid': 'uuid2', 'stat_type': 'goal', 'value': 1, 'match': match.id, 'side': 'home'},
+            {'username': 'New Player', 'stat_uuid': 'uuid3', 'stat_type': 'assist', 'value': 1, 'match': match.id, 'side': 'away'},
+            {'username': 'user', 'stat_uuid': 'uuid4', 'stat_type': 'kcoins', 'value': 5},
+        ]
+        response = self.client.post('/api/v1/soccer/stats/', valid_data,
+                                    HTTP_AUTHORIZATION=self.valid_auth, content_type='application/json')
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual([201, 201, 201, 201], [result['status'] for result in response.data])
+        self.assertEqual('uuid3', response.data[2]['data']['stat_uuid'])
+        self.assertIsNotNone(response.data[2]['data']['id'])
+
+        self.assertEqual(4, SoccerStat.objects.count())
+        self.user.refresh_from_db()
+        self.assertEqual(2, self.user.goals)
+        self.assertEqual(5, self.user.kcoins)
+        new_user = User.objects.get(username='new.player')
+        self.assertEqual(1, new_user.assists)
+        self.assertEqual(2, BoxScore.objects.get(match=match, user=self.user, side='home').goals)
+        self.assertEqual(1, BoxScore.objects.get(match=match, user=new_user, side='away').assists)
+
+    def test_stats_already_exist(self):
+        existing_stat = SoccerStat.objects.create(user=self.user, stat_uuid='uuid1', stat_type='goal', value=1)
+
+        valid_data = [
+            {'username': 'user', 'stat_uuid': 'uuid1', 'stat_type': 'goal', 'value': 1},
+            {'username': 'user', 'stat_uuid': 'uuid2', 'stat_type': 'goal', 'value': 1},
+            {'username': 'user', 'stat_uuid': 'uuid2', 'stat_type': 'goal', 'value': 1},
+        ]
+        response = self.view.create_stats(valid_data)
+
+        self.assertEqual([200, 201, 200], [result['status'] for result in response.data])
+        self.assertEqual(existing_stat.id, response.data[0]['data']['id'])
+        self.assertEqual(response.data[1]['data']['id'], response.data[2]['data']['id'])
+
+        self.user.refresh_from_db()
+        self.assertEqual(1, self.user.goals)
+
+    def test_with_invalid_items(self):
+        invalid_data = [
+            {'stat_uuid': 'uuid1', 'stat_type': 'goal', 'value': 1},
+            {'username': 'user', 'stat_uuid': 'uuid2', 'stat_type': 'invalid', 'value': 1},
+            {'username': 'user.name', 'stat_uuid': 'uuid3', 'stat_type': 'goal', 'value': 1},
+            {'username': 'user', 'stat_uuid': 'uuid4', 'stat_type': 'goal', 'value': 1, 'match': 1234},
+            {'username': 'user', 'stat_uuid': 'uuid5', 'stat_type': 'goal', 'value': 1},
+        ]
+        response = self.view.create_stats(invalid_data)
+
+        self.assertEqual([400, 400, 400, 400, 201], [result['status'] for result in response.data])
+        self.assertEqual(['uuid5'], [stat.stat_uuid for stat in SoccerStat.objects.all()])
+
+    def test_query_count(self):
+        match = Match.objects.create()
+        valid_data = [{'username': f'Player{i}', 'stat_uuid': f'uuid{i}', 'stat_type': 'goal', 'value': 1, 'match': match.id}
+                      for i in range(20)]
+        User.objects.bulk_get_or_create([item['username'] for item in valid_data])
+
+        # 5 SELECTs, an INSERT of the stats and of the box scores, an UPDATE of the users and of the box scores,
+        # plus the savepoint
+        with self.assertNumQueries(11):
+            self.view.create_stats(valid_data)
+
+    def test_empty(self):
+        self.assertRaises(ValidationError, lambda: self.view.create_stats([]))
+
+
 class CreateMatchTest(TestCase):
 
     def test_with_competition(self):
@@ -99,3 +189,132 @@ class CreateMatchTest(TestCase):
 
         match = Match.objects.filter(home_team='Team 1', away_team='Team 2').first()
         self.assertIsNotNone(match)
+        self.assertEqual(4, BoxScore.objects.filter(match=match).count())
+
+
+class ListMatchesTest(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        for i in range(5):
+            Match.objects.create(competition_name='cup' if i % 2 else 'league', home_team=f'Team {i}', away_team='Team X')
+
+    def test_pages(self):
+        response = self.client.get('/api/v1/soccer/matches/?page_size=2')
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(['Team 4', 'Team 3'], [match['home_team'] for match in response.data['results']])
+
+        response = self.client.get(f'/api/v1/soccer/matches/?page_size=2&cursor={response.data["next"]}')
+        self.assertEqual(['Team 2', 'Team 1'], [match['home_team'] for match in response.data['results']])
+
+        response = self.client.get(f'/api/v1/soccer/matches/?page_size=2&cursor={response.data["next"]}')
+        self.assertEqual(['Team 0'], [match['home_team'] for match in response.data['results']])
+        self.assertIsNone(response.data['next'])
+
+    def test_same_created_at(self):
+        Match.objects.update(created_at=Match.objects.first().created_at)
+
+        response = MatchesView.list_matches({'page_size': 3})
+        response = MatchesView.list_matches({'page_size': 3, 'cursor': response.data['next']})
+
+        self.assertEqual(['Team 1', 'Team 0'], [match['home_team'] for match in response.data['results']])
+
+    def test_filter_by_competition(self):
+        response = MatchesView.list_matches({'competition': 'cup'})
+
+        self.assertEqual(['Team 3', 'Team 1'], [match['home_team'] for match in response.data['results']])
+
+    def test_filter_by_team(self):
+        response = MatchesView.list_matches({'team': 'Team 2'})
+        self.assertEqual(['Team 2'], [match['home_team'] for match in response.data['results']])
+
+        response = MatchesView.list_matches({'team': 'Team X'})
+        self.assertEqual(5, len(response.data['results']))
+
+    def test_team_pages(self):
+        Match.objects.create(home_team='Team X', away_team='Team 5')
+        Match.objects.create(home_team='Team X', away_team='Team X')
+
+        response = MatchesView.list_matches({'team': 'Team X', 'page_size': 3})
+        self.assertEqual([('Team X', 'Team X'), ('Team X', 'Team 5'), ('Team 4', 'Team X')],
+                         [(match['home_team'], match['away_team']) for match in response.data['results']])
+
+        response = MatchesView.list_matches({'team': 'Team X', 'page_size': 3, 'cursor': response.data['next']})
+        self.assertEqual(['Team 3', 'Team 2', 'Team 1'], [match['home_team'] for match in response.data['results']])
+
+        response = MatchesView.list_matches({'team': 'Team X', 'page_size': 3, 'cursor': response.data['next']})
+        self.assertEqual(['Team 0'], [match['home_team'] for match in response.data['results']])
+        self.assertIsNone(response.data['next'])
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/v1/soccer/matches/?cursor=invalid')
+
+        self.assertEqual(400, response.status_code)
+
+
+class MatchDetailTest(TestCase):
+
+    def test_success(self):
+        response = MatchesView.create_match({
+            'home_team': 'Team A',
+            'away_team': 'Team B',
+            'home_players': ['userB', 'userA'],
+            'away_players': ['userC'],
+        })
+
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/v1/soccer/matches/{response.data["id"]}/')
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual('Team A', response.data['home_team'])
+        self.assertEqual(['usera', 'userb'], [player['username'] for player in response.data['home_players']])
+        self.assertEqual(['userc'], [player['username'] for player in response.data['away_players']])
+
+    def test_without_players(self):
+        match = Match.objects.create(home_team='Team A', away_team='Team B')
+
+        response = self.client.get(f'/api/v1/soccer/matches/{match.id}/')
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual([], response.data['home_players'])
+
+    def test_not_found(self):
+        response = self.client.get('/api/v1/soccer/matches/1234/')
+
+        self.assertEqual(404, response.status_code)
+
+
+class MatchSummaryTest(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        response = MatchesView.create_match({
+            'home_team': 'Team A',
+            'away_team': 'Team B',
+            'home_players': ['userA', 'userB'],
+            'away_players': ['userC'],
+        })
+        self.match_id = response.data['id']
+
+    def test_success(self):
+        SoccerStatsView.create_stats([
+            {'username': 'userA', 'stat_uuid': 'uuid1', 'stat_type': 'goal', 'value': 1, 'match': self.match_id, 'side': 'home'},
+            {'username': 'userC', 'stat_uuid': 'uuid2', 'stat_type': 'red', 'value': 1, 'match': self.match_id, 'side': 'away'},
+        ])
+
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/api/v1/soccer/matches/{self.match_id}/summary/')
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual('Team A', response.data['home_team'])
+        box_scores = {box_score['username']: box_score for box_score in response.data['box_scores']}
+        self.assertEqual(['usera', 'userb', 'userc'], sorted(box_scores))
+        self.assertEqual(1, box_scores['usera']['goals'])
+        self.assertEqual(0, box_scores['userb']['goals'])
+        self.assertEqual(1, box_scores['userc']['red_cards'])
+
+    def test_not_found(self):
+        response = self.client.get('/api/v1/soccer/matches/1234/summary/')
+
+        self.assertEqual(404, response.status_code)
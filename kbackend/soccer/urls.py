@@ -3,5 +3,9 @@ from soccer import views
 
 urlpatterns = [
     path('stats/', views.SoccerStatsView.as_view()),
+    path('stats/buffer/', views.StatBufferView.as_view()),
     path('matches/', views.MatchesView.as_view()),
+    path('matches/<int:match_id>/', views.MatchDetailView.as_view()),
+    path('matches/<int:match_id>/summary/', views.MatchSummaryView.as_view()),
+    path('competitions/<str:competition>/stats/', views.CompetitionStatsView.as_view()),
 ]
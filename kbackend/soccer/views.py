@@ -1,17 +1,28 @@
 import logging
 
+from django.conf import settings
+from django.db import transaction
+from django.shortcuts import get_object_or_404
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAuthenticated
 
 from core.basic_auth import ServerBasicAuthentication
+from core.pagination import keyset_paginate, keyset_paginate_union
 from users.models import User
-from soccer.models import MatchParticipation, Match
-from soccer.serializers import MatchSerializer, MatchCreateSerializer, SoccerStatCreateSerializer
+from users.helpers import normalize_display_name, to_username
+from soccer.competition_stats import get_competition_stats, invalidate_competition_stats
+from soccer.models import BoxScore, MatchParticipation, Match, SoccerStat
+from soccer.serializers import BoxScoreSerializer, MatchSerializer, MatchCreateSerializer, RosterPlayerSerializer, \
+    SoccerStatCreateSerializer, SoccerStatBatchItemSerializer
+from soccer.stat_buffer import get_stat_buffer, StatBufferFull
 
 logger = logging.getLogger('soccer')
 
+MAX_STAT_BATCH_SIZE = 500
+
 
 class SoccerStatsView(APIView):
 
@@ -19,6 +30,10 @@ class SoccerStatsView(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request):
+        if settings.STAT_BUFFER_ENABLED:
+            return self.buffer_stats(request.data)
+        if isinstance(request.data, list):
+            return self.create_stats(request.data)
         return self.create_stat(request.data)
 
     @classmethod
@@ -30,25 +45,177 @@ class SoccerStatsView(APIView):
         create_data['user'] = user.id
 
         serializer = SoccerStatCreateSerializer(data=create_data)
-        stat, created = serializer.get_or_create()
-
-        if created:
-            user.add_stat(data['stat_type'], data['value'])
+        with transaction.atomic():
+            stat, created = serializer.get_or_create()
+            if created:
+                user.add_stat(data['stat_type'], data['value'])
+                BoxScore.objects.add_stats([stat])
+        if created and stat.match:
+            invalidate_competition_stats([stat.match.competition_name])
 
         logger.info({'event': 'create_stat', 'created': created, 'data': create_data})
 
         ret_status = status.HTTP_201_CREATED if created else status.HTTP_200_OK
         return Response(serializer.data, status=ret_status)
 
+    @classmethod
+    def create_stats(cls, items):
+        if len(items) == 0:
+            raise ValidationError('No stats were provided')
+        if len(items) > MAX_STAT_BATCH_SIZE:
+            raise ValidationError(f'At most {MAX_STAT_BATCH_SIZE} stats can be posted at once')
+
+        results = [None] * len(items)
+        valid_items = {}
+        for index, item in enumerate(items):
+            serializer = SoccerStatBatchItemSerializer(data=item)
+            if serializer.is_valid():
+                valid_items[index] = serializer.validated_data
+            else:
+                results[index] = cls._error_result(serializer.errors)
+
+        competitions = cls._check_matches(valid_items, results)
+        users = cls._get_users(valid_items, results)
+
+        uuids = {data['stat_uuid'] for data in valid_items.values()}
+        stats = {stat.stat_uuid: stat for stat in SoccerStat.objects.filter(stat_uuid__in=uuids)}
+
+        new_stats = []
+        for data in valid_items.values():
+            if data['stat_uuid'] in stats:
+                continue
+            stat = SoccerStat(user=users[data['username']], stat_uuid=data['stat_uuid'], stat_type=data['stat_type'],
+                              value=data['value'], match_id=data.get('match_id'), side=data.get('side', ''))
+            stats[stat.stat_uuid] = stat
+            new_stats.append(stat)
+
+        with transaction.atomic():
+            created_stats = SoccerStat.objects.insert_ignore_conflicts(new_stats)
+            User.objects.bulk_add_stats(created_stats)
+            BoxScore.objects.add_stats(created_stats)
+        invalidate_competition_stats(competitions[stat.match_id] for stat in created_stats if stat.match_id is not None)
+
+        new_uuids = {stat.stat_uuid for stat in created_stats}
+        if len(created_stats) < len(new_stats):
+            # Some stats were inserted by a concurrent request in the meantime
+            conflicting_uuids = [stat.stat_uuid for stat in new_stats if stat.stat_uuid not in new_uuids]
+            stats.update({stat.stat_uuid: stat for stat in SoccerStat.objects.filter(stat_uuid__in=conflicting_uuids)})
+
+        # Only the first occurrence of a new stat_uuid counts as created
+        for index, data in valid_items.items():
+            uuid = data['stat_uuid']
+            created = uuid in new_uuids
+            new_uuids.discard(uuid)
+            ret_status = status.HTTP_201_CREATED if created else status.HTTP_200_OK
+            results[index] = {'status': ret_status, 'data': SoccerStatCreateSerializer(stats[uuid]).data}
+
+        logger.info({'event': 'create_stats', 'created': len(created_stats), 'total': len(items),
+                     'invalid': len(items) - len(valid_items)})
+
+        return Response(results)
+
+    @classmethod
+    def _get_users(cls, valid_items, results):
+        provided_names = {}
+        for index, data in list(valid_items.items()):
+            try:
+                username = to_username(normalize_display_name(data['username']))
+            except ValidationError as ex:
+                del valid_items[index]
+                results[index] = cls._error_result({'username': ex.detail})
+                continue
+            if not username:
+                del valid_items[index]
+                results[index] = cls._error_result({'username': ['Username was not provided']})
+                continue
+            provided_names.setdefault(username, data['username'])
+            data['username'] = username
+
+        users = User.objects.bulk_get_or_create(list(provided_names.values()))
+        return {user.username: user for user in users}
+
+    @classmethod
+    def _check_matches(cls, valid_items, results):
+        match_ids = {data['match_id'] for data in valid_items.values() if data.get('match_id') is not None}
+        competitions = dict(Match.objects.filter(id__in=match_ids).values_list('id', 'competition_name'))
+
+        for index, data in list(valid_items.items()):
+            match_id = data.get('match_id')
+            if match_id is not None and match_id not in competitions:
+                del valid_items[index]
+                results[index] = cls._error_result({'match': [f'Invalid pk "{match_id}" - object does not exist.']})
+        return competitions
+
+    @classmethod
+    def buffer_stats(cls, data):
+        items = data if isinstance(data, list) else [data]
+        if len(items) == 0:
+            raise ValidationError('No stats were provided')
+
+        item_serializers = [SoccerStatBatchItemSerializer(data=item) for item in items]
+        errors = [serializer.errors for serializer in item_serializers if not serializer.is_valid()]
+        if errors:
+            raise ValidationError(errors)
+
+        stat_buffer = get_stat_buffer()
+        try:
+            stat_buffer.append([serializer.data for serializer in item_serializers])
+        except StatBufferFull:
+            logger.warning({'event': 'stat_buffer_full', 'count': len(items)})
+            return Response('Stat buffer is full', status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                            headers={'Retry-After': str(stat_buffer.flush_interval)})
+        stat_buffer.ensure_flusher()
+
+        return Response({'queued': len(items)}, status=status.HTTP_202_ACCEPTED)
+
+    @staticmethod
+    def _error_result(errors):
+        return {'status': status.HTTP_400_BAD_REQUEST, 'errors': errors}
 
-class MatchesView(APIView):
+
+class StatBufferView(APIView):
 
     authentication_classes = [ServerBasicAuthentication]
     permission_classes = [IsAuthenticated]
 
+    def get(self, request):
+        data = {'enabled': settings.STAT_BUFFER_ENABLED}
+        if settings.STAT_BUFFER_ENABLED:
+            data.update(get_stat_buffer().metrics())
+        return Response(data)
+
+
+class MatchesView(APIView):
+
+    authentication_classes = [ServerBasicAuthentication]
+
+    def get_permissions(self):
+        if self.request.method == 'GET':
+            return [AllowAny()]
+        return [IsAuthenticated()]
+
+    def get(self, request):
+        return self.list_matches(request.GET)
+
     def post(self, request):
         return self.create_match(request.data)
 
+    @classmethod
+    def list_matches(cls, parameters):
+        matches = Match.objects.all()
+
+        competition = parameters.get('competition')
+        if competition:
+            matches = matches.filter(competition_name=competition)
+        team = parameters.get('team')
+        if team:
+            # A page from each of the team indexes
+            matches, next_cursor = keyset_paginate_union(
+                [matches.filter(home_team=team), matches.filter(away_team=team)], ('-created_at', '-id'), parameters)
+        else:
+            matches, next_cursor = keyset_paginate(matches, ('-created_at', '-id'), parameters)
+        return Response({'results': MatchSerializer(matches, many=True).data, 'next': next_cursor})
+
     @classmethod
     def create_match(cls, data):
         serializer = MatchCreateSerializer(data=data)
@@ -64,10 +231,49 @@ class MatchesView(APIView):
 
         MatchParticipation.objects.bulk_create_team(match, home_players, side='home')
         MatchParticipation.objects.bulk_create_team(match, away_players, side='away')
+        BoxScore.objects.bulk_create_team(match, home_players, side='home')
+        BoxScore.objects.bulk_create_team(match, away_players, side='away')
 
         User.objects.bulk_add_match(home_players + away_players)
+        invalidate_competition_stats([match.competition_name])
 
         logger.info({'event': 'create_match', 'data': serializer.data})
 
         match_serializer = MatchSerializer(match)
         return Response(match_serializer.data, status=status.HTTP_201_CREATED)
+
+
+class MatchDetailView(APIView):
+
+    def get(self, request, match_id):
+        # The match is joined to the rosters, it is only queried on its own when nobody played in it
+        participations = list(MatchParticipation.objects.filter(match_id=match_id).select_related('match', 'user')
+                              .order_by('side', 'user__username'))
+        match = participations[0].match if participations else get_object_or_404(Match, id=match_id)
+
+        data = MatchSerializer(match).data
+        for side in ('home', 'away'):
+            roster = [participation for participation in participations if participation.side == side]
+            data[f'{side}_players'] = RosterPlayerSerializer(roster, many=True).data
+        return Response(data)
+
+
+class MatchSummaryView(APIView):
+
+    def get(self, request, match_id):
+        match = get_object_or_404(Match, id=match_id)
+        box_scores = BoxScore.objects.filter(match=match).select_related('user').order_by('side', 'user__username')
+
+        data = MatchSerializer(match).data
+        data['box_scores'] = BoxScoreSerializer(box_scores, many=True).data
+        return Response(data)
+
+
+class CompetitionStatsView(APIView):
+
+    def get(self, request, competition):
+        # Before the cache, so that requests for made up competitions do not fill it
+        if not Match.objects.filter(competition_name=competition).exists():
+            raise NotFound(f'No such competition: {competition}')
+
+        return Response(get_competition_stats(competition))
@@ -1 +1,3 @@
 from users.custom_exception_handler import custom_exception_handler
+
+default_app_config = 'users.apps.UsersConfig'
@@ -0,0 +1,97 @@
+import bisect
+import threading
+import time
+
+from core.cache import get_generation, increment_generation
+from users.models import User
+
+AUTOCOMPLETE_SIZE = 10
+# Backstop for renamed users and for users that were committed out of id order, seconds
+AUTOCOMPLETE_REBUILD_INTERVAL = 10 * 60
+
+# Bumped when the index has to be rebuilt in every worker
+GENERATION_KEY = 'autocomplete:generation'
+# Bumped when users are created, the workers then only load the new users
+CREATED_KEY = 'autocomplete:created'
+
+_index = None
+_index_lock = threading.Lock()
+
+
+class PrefixIndex:
+    """ Usernames in sorted order, the ones starting with a prefix are found with a binary search
+
+    Display names are not indexed: a username is the display name in lower case with dots for spaces, and the prefix
+    is normalized the same way by the view, so a display name prefix finds the same users.
+    """
+
+    def __init__(self, generation, created):
+        self.generation = generation
+        self.created = created
+        self.built_at = time.monotonic()
+        self.last_id = 0
+        self.usernames = []
+        self.users = []
+        self._ids = set()
+
+    def add(self, users):
+        for user in users:
+            if user['id'] in self._ids:
+                continue
+            position = bisect.bisect_left(self.usernames, user['username'])
+            self.usernames.insert(position, user['username'])
+            self.users.insert(position, user)
+            self._ids.add(user['id'])
+            self.last_id = max(self.last_id, user['id'])
+
+    def lookup(self, prefix, limit):
+        start = bisect.bisect_left(self.usernames, prefix)
+        found = []
+        for username, user in zip(self.usernames[start:start + limit], self.users[start:start + limit]):
+            if not username.startswith(prefix):
+                break
+            found.append(user)
+        return found
+
+    def is_expired(self):
+        return time.monotonic() - self.built_at > AUTOCOMPLETE_REBUILD_INTERVAL
+
+    @classmethod
+    def build(cls, generation, created):
+        index = cls(generation, created)
+        users = sorted(_select_users(User.objects.all()), key=lambda user: user['username'])
+        index.usernames = [user['username'] for user in users]
+        index.users = users
+        index._ids = {user['id'] for user in users}
+        index.last_id = max(index._ids, default=0)
+        return index
+
+
+def get_suggestions(username_prefix, limit=AUTOCOMPLETE_SIZE):
+    """ Users whose username starts with the prefix, ordered by username """
+    index = _get_index(get_generation(GENERATION_KEY), get_generation(CREATED_KEY))
+    return index.lookup(username_prefix, limit)
+
+
+def notify_users_created():
+    increment_generation(CREATED_KEY)
+
+
+def invalidate_autocomplete():
+    increment_generation(GENERATION_KEY)
+
+
+def _get_index(generation, created):
+    global _index
+
+    with _index_lock:
+        if _index is None or _index.generation != generation or _index.is_expired():
+            _index = PrefixIndex.build(generation, created)
+        elif _index.created != created:
+            _index.add(_select_users(User.objects.filter(id__gt=_index.last_id)))
+            _index.created = created
+        return _index
+
+
+def _select_users(users):
+    return list(users.values('id', 'username', 'display_name').iterator())
@@ -0,0 +1,143 @@
+from bisect import bisect_left
+
+from django.core.cache import cache
+from django.db.models import Count
+
+from users.models import User
+
+LEADERBOARD_COUNTERS = ['goals', 'assists', 'kcoins', 'matches']
+LEADERBOARD_SIZE = 100
+# Backstop for updates that are lost between workers, seconds
+LEADERBOARD_TIMEOUT = 5 * 60
+# Seconds, a worker that dies while it rebuilds a leaderboard keeps the others from caching it this long at most
+REBUILD_LOCK_TIMEOUT = 5
+
+
+def get_leaderboard(counter):
+    """ Top players by the counter, ordered by the counter and then by id """
+    entries = cache.get(_cache_key(counter))
+    if entries is None:
+        users = (User.objects.filter(is_test=False).order_by(f'-{counter}', 'id')
+                 .values('id', 'username', 'display_name', counter)[:LEADERBOARD_SIZE])
+        entries = [_to_entry(user, counter) for user in users]
+        # Only one worker caches it, the others serve what they read
+        lock_key = f'{_cache_key(counter)}:rebuild'
+        if cache.add(lock_key, True, REBUILD_LOCK_TIMEOUT):
+            cache.set(_cache_key(counter), entries, LEADERBOARD_TIMEOUT)
+            cache.delete(lock_key)
+    return _with_ranks(entries)
+
+
+def get_ranks(user):
+    """ Rank of the user by each counter
+
+    Below the leaderboards the rank comes from a cached histogram of the counter values, so it may miss the changes
+    of the other players of the last LEADERBOARD_TIMEOUT seconds.
+    """
+    ranks = {}
+    for counter in LEADERBOARD_COUNTERS:
+        entries = cache.get(_cache_key(counter))
+        cached_ranks = {entry['id']: entry['rank'] for entry in _with_ranks(entries or [])}
+        if user.id in cached_ranks:
+            ranks[counter] = cached_ranks[user.id]
+        else:
+            ranks[counter] = _rank_from_histogram(_get_histogram(counter), getattr(user, counter))
+    return ranks
+
+
+def update_leaderboards(user_ids, counters):
+    """ Merge the new counter values of the users into the cached leaderboards, after they are committed
+
+    Not locked, so that stat writes do not wait for each other. A merge that runs at the same time in another worker
+    may overwrite this one, LEADERBOARD_TIMEOUT bounds how long the leaderboard misses it.
+    """
+    cache_keys = {_cache_key(counter): counter for counter in counters}
+    cached = cache.get_many(cache_keys.keys())
+    if not cached:
+        return
+
+    cached_counters = [cache_keys[key] for key in cached]
+    users = list(User.objects.filter(id__in=user_ids, is_test=False).values('id', 'username', 'display_name', *cached_counters))
+    updated = {}
+    for key, entries in cached.items():
+        merged = _merge(entries, cache_keys[key], users)
+        if merged is None:
+            cache.delete(key)
+        else:
+            updated[key] = merged
+    cache.set_many(updated, LEADERBOARD_TIMEOUT)
+
+
+def invalidate_leaderboards():
+    cache.delete_many([_cache_key(counter) for counter in LEADERBOARD_COUNTERS] +
+                      [_histogram_cache_key(counter) for counter in LEADERBOARD_COUNTERS])
+
+
+def _get_histogram(counter):
+    """ Negated distinct values of the counter, in ascending order, and the number of players with each value or a higher one """
+    histogram = cache.get(_histogram_cache_key(counter))
+    if histogram is None:
+        # A scan of the table, once per LEADERBOARD_TIMEOUT rather than for each rank
+        rows = (User.objects.filter(is_test=False).values_list(counter).annotate(count=Count('id'))
+                .order_by(f'-{counter}'))
+        negated_values, totals = [], []
+        for value, count in rows:
+            negated_values.append(-value)
+            totals.append((totals[-1] if totals else 0) + count)
+        histogram = (negated_values, totals)
+        cache.set(_histogram_cache_key(counter), histogram, LEADERBOARD_TIMEOUT)
+    return histogram
+
+
+def _rank_from_histogram(histogram, value):
+    negated_values, totals = histogram
+    # The players above are the ones with the values before the first one that is not higher
+    index = bisect_left(negated_values, -value)
+    return (totals[index - 1] if index > 0 else 0) + 1
+
+
+def _merge(entries, counter, users):
+    # A leaderboard with less than LEADERBOARD_SIZE entries has every player in it
+    is_complete = len(entries) < LEADERBOARD_SIZE
+    last_key = _sort_key(entries[-1]) if entries else None
+
+    entries_by_id = {entry['id']: entry for entry in entries}
+    for user in users:
+        entry = _to_entry(user, counter)
+        was_listed = entries_by_id.pop(user['id'], None) is not None
+        is_above_last = last_key is None or _sort_key(entry) <= last_key
+        if was_listed and not is_above_last and not is_complete:
+            # Dropped down, a player outside of the leaderboard may take its place
+            return None
+        if was_listed or is_above_last or is_complete:
+            entries_by_id[user['id']] = entry
+
+    return sorted(entries_by_id.values(), key=_sort_key)[:LEADERBOARD_SIZE]
+
+
+def _with_ranks(entries):
+    # Players with the same value share the rank
+    ranked = []
+    for index, entry in enumerate(entries):
+        if index > 0 and entry['value'] == entries[index - 1]['value']:
+            rank = ranked[-1]['rank']
+        else:
+            rank = index + 1
+        ranked.append({'rank': rank, **entry})
+    return ranked
+
+
+def _to_entry(user, counter):
+    return {'id': user['id'], 'username': user['username'], 'display_name': user['display_name'], 'value': user[counter]}
+
+
+def _sort_key(entry):
+    return -entry['value'], entry['id']
+
+
+def _cache_key(counter):
+    return f'leaderboard:{counter}'
+
+
+def _histogram_cache_key(counter):
+    return f'leaderboard:{counter}:histogram'
@@ -0,0 +1,91 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from soccer.models import MatchParticipation, SoccerStat
+from users.leaderboard import invalidate_leaderboards
+from users.marketplace import invalidate_marketplace
+from users.profile_cache import invalidate_profiles
+from users.models import User
+from users.models.user import STAT_COUNTERS
+
+COUNTERS = list(STAT_COUNTERS.values()) + ['matches']
+
+
+class Command(BaseCommand):
+    help = 'Recompute the stat counters of the users from their stats and match participations'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Number of users reconciled at once')
+        parser.add_argument('--dry-run', action='store_true', help='Only print the counters that differ')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        dry_run = options['dry_run']
+
+        checked = 0
+        changed = 0
+        last_id = 0
+        while True:
+            with transaction.atomic():
+                users = User.objects.filter(id__gt=last_id).order_by('id').only('id', 'username', *COUNTERS)
+                if not dry_run:
+                    # Counter updates of the chunk wait until it is written
+                    users = users.select_for_update()
+                users = list(users[:chunk_size])
+                if not users:
+                    break
+
+                changed_users = self._reconcile(users, dry_run)
+                if changed_users and not dry_run:
+                    User.objects.bulk_update(changed_users, COUNTERS + ['updated_at'])
+                    transaction.on_commit(lambda ids=[user.id for user in changed_users]: invalidate_profiles(ids))
+
+            checked += len(users)
+            changed += len(changed_users)
+            last_id = users[-1].id
+
+        if changed and not dry_run:
+            # The marketplace is filtered and sorted by the counters too
+            invalidate_leaderboards()
+            invalidate_marketplace()
+
+        verb = 'would be updated' if dry_run else 'updated'
+        self.stdout.write(f'Checked {checked} users, {changed} {verb}')
+
+    def _reconcile(self, users, dry_run):
+        counts = self._count(users[0].id, users[-1].id)
+
+        now = timezone.now()
+        changed_users = []
+        for user in users:
+            user_counts = counts.get(user.id, {})
+            diff = {counter: (getattr(user, counter), user_counts.get(counter, 0)) for counter in COUNTERS
+                    if getattr(user, counter) != user_counts.get(counter, 0)}
+            if not diff:
+                continue
+
+            if dry_run:
+                changes = ', '.join(f'{counter} {old} -> {new}' for counter, (old, new) in diff.items())
+                self.stdout.write(f'{user.username}: {changes}')
+            for counter, (_, new) in diff.items():
+                setattr(user, counter, new)
+            user.updated_at = now
+            changed_users.append(user)
+        return changed_users
+
+    @staticmethod
+    def _count(first_id, last_id):
+        # Aggregated in the database over a range of the (user, match) indexes, only the totals are streamed back
+        counts = {}
+        stat_totals = (SoccerStat.objects.filter(user_id__gte=first_id, user_id__lte=last_id, stat_type__in=STAT_COUNTERS)
+                       .values('user_id', 'stat_type').annotate(total=Sum('value')).order_by())
+        for row in stat_totals.iterator():
+            counts.setdefault(row['user_id'], {})[STAT_COUNTERS[row['stat_type']]] = row['total']
+
+        match_totals = (MatchParticipation.objects.filter(user_id__gte=first_id, user_id__lte=last_id)
+                        .values('user_id').annotate(total=Count('id')).order_by())
+        for row in match_totals.iterator():
+            counts.setdefault(row['user_id'], {})['matches'] = row['total']
+        return counts
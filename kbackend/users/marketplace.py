@@ -0,0 +1,66 @@
+import time
+
+from rest_framework.exceptions import ValidationError
+
+from core.cache import TieredCache
+from core.pagination import get_page_size, keyset_paginate
+from users.models import User
+from users.serializers import MarketplaceItem
+
+# Query parameters of the filters, mapped to the counter they limit
+MARKETPLACE_FILTERS = {
+    'min_goals': 'goals',
+    'min_assists': 'assists',
+    'min_matches': 'matches',
+}
+# Sort keys, each one is backed by an index of the available players and ends with a unique field
+MARKETPLACE_ORDERINGS = {
+    'username': ('username',),
+    'goals': ('-goals', 'id'),
+    'assists': ('-assists', 'id'),
+    'matches': ('-matches', 'id'),
+}
+# Backstop for invalidations that are lost between workers and for counter updates, seconds
+MARKETPLACE_TIMEOUT = 5 * 60
+
+marketplace_cache = TieredCache('marketplace', MARKETPLACE_TIMEOUT)
+
+
+def get_marketplace_page(parameters):
+    """ A page of the players available for transfer, cached until one of them changes """
+    return get_versioned_marketplace_page(parameters)[1]
+
+
+def get_versioned_marketplace_page(parameters):
+    """ The page and a version of it for the ETag, which changes whenever the page is loaded from the database again """
+    sort = parameters.get('sort', 'username')
+    if sort not in MARKETPLACE_ORDERINGS:
+        raise ValidationError(f'sort must be one of {", ".join(MARKETPLACE_ORDERINGS)}')
+    min_counters = _get_min_counters(parameters)
+    page = _load_page(sort, min_counters, parameters.get('cursor', ''), get_page_size(parameters))
+    return page['version'], page['page']
+
+
+def invalidate_marketplace():
+    marketplace_cache.invalidate()
+
+
+@marketplace_cache.cached()
+def _load_page(sort, min_counters, cursor, page_size):
+    ordering = MARKETPLACE_ORDERINGS[sort]
+    users = User.objects.search_marketplace(ordering[0].lstrip('-'), **min_counters)
+    users, next_cursor = keyset_paginate(users, ordering, {'cursor': cursor, 'page_size': page_size})
+    return {'version': time.time_ns(), 'page': {'results': MarketplaceItem(users, many=True).data, 'next': next_cursor}}
+
+
+def _get_min_counters(parameters):
+    min_counters = {}
+    for parameter, counter in MARKETPLACE_FILTERS.items():
+        value = parameters.get(parameter)
+        if value is None or value == '':
+            continue
+        try:
+            min_counters[counter] = int(value)
+        except ValueError:
+            raise ValidationError(f'{parameter} must be a number')
+    return min_counters
@@ -0,0 +1,36 @@
+# Generated by Django 3.1.1 on 2026-10-18 10:10
+
+from django.db import migrations, models
+import users.models.user
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0008_user_matches'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='user',
+            managers=[
+                ('objects', users.models.user.CustomUserManager()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(is_test=False), fields=['-goals', 'id'], name='user_goals_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(is_test=False), fields=['-assists', 'id'], name='user_assists_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(is_test=False), fields=['-kcoins', 'id'], name='user_kcoins_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(is_test=False), fields=['-matches', 'id'], name='user_matches_idx'),
+        ),
+    ]
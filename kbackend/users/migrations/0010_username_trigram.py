@@ -0,0 +1,46 @@
+# Generated by Django 3.1.1 on 2026-10-18 10:15
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def index_usernames(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        # LIKE '%term%' on the username is served by a trigram index
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        schema_editor.execute('CREATE INDEX IF NOT EXISTS user_username_trgm_idx ON users_user USING gin (username gin_trgm_ops)')
+    elif schema_editor.connection.vendor == 'sqlite':
+        User = apps.get_model('users', 'User')
+        UsernameTrigram = apps.get_model('users', 'UsernameTrigram')
+        for user in User.objects.only('id', 'username').iterator():
+            trigrams = {user.username[i:i + 3] for i in range(len(user.username) - 2)}
+            UsernameTrigram.objects.bulk_create([UsernameTrigram(user=user, trigram=trigram) for trigram in trigrams])
+
+
+def drop_username_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS user_username_trgm_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0009_leaderboard_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UsernameTrigram',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigram', models.CharField(max_length=3)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='usernametrigram',
+            constraint=models.UniqueConstraint(fields=('trigram', 'user'), name='unique_username_trigram'),
+        ),
+        migrations.RunPython(index_usernames, drop_username_index),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.1.1 on 2026-10-18 10:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0010_username_trigram'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(available_for_transfer=True), fields=['username'], name='user_marketplace_idx'),
+        ),
+    ]
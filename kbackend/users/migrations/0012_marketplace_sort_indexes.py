@@ -0,0 +1,25 @@
+# Generated by Django 3.1.1 on 2026-10-18 10:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0011_marketplace_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(available_for_transfer=True), fields=['-goals', 'id'], name='user_marketplace_goals_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(available_for_transfer=True), fields=['-assists', 'id'], name='user_marketplace_assists_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(available_for_transfer=True), fields=['-matches', 'id'], name='user_marketplace_matches_idx'),
+        ),
+    ]
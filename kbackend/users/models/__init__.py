@@ -1,2 +1,3 @@
 from .user import User
 from .user_details import UserDetails
+from .username_trigram import UsernameTrigram
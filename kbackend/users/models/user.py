@@ -1,19 +1,56 @@
+from collections import defaultdict
+
 from django.contrib.auth.models import AbstractUser, UserManager
 from django.core.validators import RegexValidator
-from django.db import models
+from django.db import models, transaction
+from django.db.models.functions import StrIndex
+from django.utils import timezone
 
 from rest_framework.exceptions import ValidationError, PermissionDenied
 
+from core.helpers import bulk_increment
 from soccer.models import SOCCER_STAT_TYPES
 
 SOCCER_STATS = [stat_type[0] for stat_type in SOCCER_STAT_TYPES]
 
+# Stat types that are counted on the user, mapped to the counter field
+STAT_COUNTERS = {
+    'goal': 'goals',
+    'assist': 'assists',
+    'kcoins': 'kcoins',
+}
+
 
 class CustomUserManager(UserManager):
 
     def bulk_add_match(self, users):
+        from users.leaderboard import update_leaderboards
+        from users.profile_cache import invalidate_profiles
+
         user_ids = [user.id for user in users]
-        self.filter(id__in=user_ids).update(matches=models.F('matches') + 1)
+        self.filter(id__in=user_ids).update(matches=models.F('matches') + 1, updated_at=timezone.now())
+        # Not before the commit, a leaderboard or a profile loaded in the meantime would be cached with the old
+        # counters. QuerySet.update does not send post_save.
+        transaction.on_commit(lambda: update_leaderboards(user_ids, ['matches']))
+        transaction.on_commit(lambda: invalidate_profiles(user_ids))
+
+    def bulk_add_stats(self, stats):
+        from users.leaderboard import update_leaderboards
+        from users.profile_cache import invalidate_profiles
+
+        deltas = defaultdict(lambda: defaultdict(int))
+        for stat in stats:
+            counter = STAT_COUNTERS.get(stat.stat_type)
+            if counter:
+                deltas[stat.user_id][counter] += stat.value
+
+        bulk_increment(self.all(), {(('id', user_id),): user_deltas for user_id, user_deltas in deltas.items()},
+                       updated_at=timezone.now())
+
+        counters = {counter for user_deltas in deltas.values() for counter in user_deltas}
+        user_ids = list(deltas)
+        transaction.on_commit(lambda: update_leaderboards(user_ids, counters))
+        transaction.on_commit(lambda: invalidate_profiles(user_ids))
 
     def reset_password(self, username, display_name, email, uuid, password):
         from users.serializers import PasswordResetSerializer
@@ -61,23 +98,59 @@ class CustomUserManager(UserManager):
         users = list(self.filter(username__in=usernames).all())
         existing_usernames = {user.username for user in users}
 
-        missing_name_pairs = [pair for pair in name_pairs if pair[0] not in existing_usernames]
-
-        for username, display_name in missing_name_pairs:
-            new_user = self._create_non_registered(username, display_name)
-            users.append(new_user)
+        missing_users = {}
+        for username, display_name in name_pairs:
+            if username not in existing_usernames and username not in missing_users:
+                missing_users[username] = self._build_non_registered(username, display_name)
+
+        if missing_users:
+            from users.autocomplete import notify_users_created
+            from users.models.username_trigram import UsernameTrigram
+
+            # Users created concurrently by another request are skipped here and selected below
+            self.bulk_create(missing_users.values(), ignore_conflicts=True)
+            created_users = list(self.filter(username__in=missing_users.keys()).all())
+            # bulk_create does not send post_save
+            UsernameTrigram.objects.index_users(created_users)
+            transaction.on_commit(notify_users_created, using=self.db)
+            users += created_users
         return users
 
     def search_by_name(self, username):
-        return self.filter(username__contains=username).order_by('username')[:100]
+        # Exact match first, then by the position of the match
+        exact = models.Case(models.When(username=username, then=0), default=1, output_field=models.IntegerField())
+        return self.filter_by_name(username).order_by(exact, StrIndex('username', models.Value(username)), 'username')[:100]
+
+    def filter_by_name(self, username):
+        """ Users whose username contains the search term, in no particular order """
+        from users.models.username_trigram import UsernameTrigram, uses_trigram_table
+
+        users = self.filter(username__contains=username)
+        if uses_trigram_table(self.db) and len(username) >= 3:
+            # The trigrams narrow down the candidates, the substring match above still decides
+            users = users.filter(id__in=UsernameTrigram.objects.user_ids_containing(username))
+        return users
 
-    def search_marketplace(self):
-        return self.filter(available_for_transfer=True).order_by('username')[:100]
+    def search_marketplace(self, sort_field='username', **min_counters):
+        """ Players available for transfer, min_counters are the least values of the stat counters, eg. goals=3 """
+        users = self.filter(available_for_transfer=True)
+        for counter, value in min_counters.items():
+            if counter == sort_field:
+                users = users.filter(**{f'{counter}__gte': value})
+            else:
+                # Not indexable, so the database walks the index of the sort order and stops at the end of the page
+                # instead of sorting every player that passes the filter
+                users = users.annotate(**{f'{counter}_value': models.F(counter) + 0}).filter(**{f'{counter}_value__gte': value})
+        return users
 
     def _create_non_registered(self, username, display_name):
-        user = self.create_user(username, display_name=display_name, is_active=False)
+        user = self._build_non_registered(username, display_name)
+        user.save(using=self._db)
+        return user
+
+    def _build_non_registered(self, username, display_name):
+        user = self.model(username=self.model.normalize_username(username), display_name=display_name, is_active=False)
         user.set_unusable_password()
-        user.save()
         return user
 
 
@@ -123,9 +196,33 @@ class User(AbstractUser):
 
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta(AbstractUser.Meta):
+        # Leaderboards and ranks
+        indexes = [
+            models.Index(fields=['-goals', 'id'], name='user_goals_idx', condition=models.Q(is_test=False)),
+            models.Index(fields=['-assists', 'id'], name='user_assists_idx', condition=models.Q(is_test=False)),
+            models.Index(fields=['-kcoins', 'id'], name='user_kcoins_idx', condition=models.Q(is_test=False)),
+            models.Index(fields=['-matches', 'id'], name='user_matches_idx', condition=models.Q(is_test=False)),
+            # Marketplace, one index for each sort order
+            models.Index(fields=['username'], name='user_marketplace_idx', condition=models.Q(available_for_transfer=True)),
+            models.Index(fields=['-goals', 'id'], name='user_marketplace_goals_idx',
+                         condition=models.Q(available_for_transfer=True)),
+            models.Index(fields=['-assists', 'id'], name='user_marketplace_assists_idx',
+                         condition=models.Q(available_for_transfer=True)),
+            models.Index(fields=['-matches', 'id'], name='user_marketplace_matches_idx',
+                         condition=models.Q(available_for_transfer=True)),
+        ]
+
     # Required for admin users
     REQUIRED_FIELDS = ['email', 'uuid']
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        user = super().from_db(db, field_names, values)
+        # The username that the trigrams were indexed with, so that other saves leave them alone
+        user._indexed_username = user.__dict__.get('username')
+        return user
+
     # Remove these Django fields and derive them from the SL username
     first_name = None
     last_name = None
@@ -150,19 +247,19 @@ class User(AbstractUser):
         return self.get_full_name()
 
     def add_stat(self, stat_type, value):
+        from users.leaderboard import update_leaderboards
+        from users.profile_cache import invalidate_profiles
 
         if stat_type not in SOCCER_STATS:
             raise KeyError(f'No such stat type: {stat_type}')
 
-        if stat_type == 'goal':
-            self.goals += value
-            self.save()
-        elif stat_type == 'assist':
-            self.assists += value
-            self.save()
-        elif stat_type == 'kcoins':
-            self.kcoins += value
-            self.save()
+        counter = STAT_COUNTERS.get(stat_type)
+        if counter:
+            # Increment in the database so that concurrent stats for the same user are not lost,
+            # the counter of this instance is not refreshed
+            User.objects.filter(id=self.id).update(**{counter: models.F(counter) + value}, updated_at=timezone.now())
+            transaction.on_commit(lambda: update_leaderboards([self.id], [counter]))
+            transaction.on_commit(lambda: invalidate_profiles([self.id]))
 
     def change_password(self, old_password, new_password):
         if not self.check_password(old_password):
@@ -0,0 +1,42 @@
+from django.db import models, connections
+from django.conf import settings
+
+
+def get_trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def uses_trigram_table(db):
+    # Postgres indexes the usernames with pg_trgm instead, see migration 0010_username_trigram
+    return connections[db].vendor == 'sqlite'
+
+
+class UsernameTrigramManager(models.Manager):
+
+    def index_users(self, users, replace=False):
+        """ Add the trigrams of the usernames, a no-op unless the database relies on this table """
+        if not uses_trigram_table(self.db):
+            return
+        if replace:
+            self.filter(user__in=users).delete()
+        trigrams = [UsernameTrigram(user=user, trigram=trigram) for user in users for trigram in get_trigrams(user.username)]
+        self.bulk_create(trigrams, ignore_conflicts=True)
+
+    def user_ids_containing(self, text):
+        """ Ids of the users whose username has every trigram of the text, a superset of the ones that contain it """
+        trigrams = get_trigrams(text)
+        return (self.filter(trigram__in=trigrams).values('user_id')
+                .annotate(count=models.Count('id')).filter(count=len(trigrams)).values('user_id'))
+
+
+class UsernameTrigram(models.Model):
+    """ Substring search index of the usernames for databases without a trigram index """
+    objects = UsernameTrigramManager()
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    trigram = models.CharField(max_length=3)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['trigram', 'user'], name='unique_username_trigram'),
+        ]
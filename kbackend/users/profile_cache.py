@@ -0,0 +1,30 @@
+from core import metrics
+from core.cache import TieredCache
+from users.models import User
+from users.serializers import UserProfileSerializer
+
+# Backstop for invalidations that are lost between workers, seconds
+PROFILE_TIMEOUT = 5 * 60
+
+profile_cache = TieredCache('profile', PROFILE_TIMEOUT)
+
+
+def get_profile(user_id):
+    """ Serialized public profile of the user and its last modification time, None if there is no such user """
+    profile = profile_cache.get(user_id)
+    if profile is not None:
+        metrics.increment('profile_cache_hits')
+        return profile
+
+    metrics.increment('profile_cache_misses')
+    user = User.objects.filter(id=user_id).prefetch_related('user_details').first()
+    if user is None:
+        return None
+    last_modified = max([user.updated_at] + [details.updated_at for details in user.user_details.all()])
+    profile = {'data': UserProfileSerializer(user).data, 'last_modified': last_modified}
+    profile_cache.set(user_id, profile)
+    return profile
+
+
+def invalidate_profiles(user_ids):
+    profile_cache.delete_many(user_ids)
@@ -17,6 +17,12 @@ class UserListItem(serializers.ModelSerializer):
         fields = ('id', 'username', 'display_name', 'profile_picture_url', 'introduction')
 
 
+class MarketplaceItem(UserListItem):
+
+    class Meta(UserListItem.Meta):
+        fields = UserListItem.Meta.fields + ('goals', 'assists', 'matches')
+
+
 class UserDetailsSerializer(serializers.ModelSerializer):
     updated_at = serializers.DateTimeField(read_only=True)
 
@@ -62,9 +68,15 @@ class UserProfileEditSerializer(serializers.ModelSerializer):
         fields = ('id', 'introduction', 'available_for_transfer', 'user_details')
 
     def update(self, instance, validated_data):
+        from users.marketplace import invalidate_marketplace
+
+        was_listed = instance.available_for_transfer
         own_data = {key: value for key, value in validated_data.items() if key != 'user_details'}
         super().update(instance, own_data)
 
+        if was_listed or instance.available_for_transfer:
+            invalidate_marketplace()
+
         if 'user_details' in validated_data:
             self._update_user_details(instance.id, validated_data['user_details'])
 
@@ -0,0 +1,39 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from users.autocomplete import invalidate_autocomplete, notify_users_created
+from users.marketplace import invalidate_marketplace
+from users.models import User, UserDetails, UsernameTrigram
+from users.profile_cache import invalidate_profiles
+
+
+@receiver(post_save, sender=User)
+def index_username(sender, instance, created, update_fields, **kwargs):
+    username = instance.__dict__.get('username')
+    username_saved = update_fields is None or 'username' in update_fields
+    if created or (username_saved and username != getattr(instance, '_indexed_username', None)):
+        UsernameTrigram.objects.db_manager(kwargs['using']).index_users([instance], replace=not created)
+        instance._indexed_username = username
+    if created:
+        # The workers load the new users once they can see them
+        transaction.on_commit(notify_users_created, using=kwargs['using'])
+
+
+@receiver(post_delete, sender=User)
+def unindex_user(sender, instance, **kwargs):
+    invalidate_autocomplete()
+    if instance.available_for_transfer:
+        invalidate_marketplace()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_profile(sender, instance, **kwargs):
+    invalidate_profiles([instance.id])
+
+
+@receiver(post_save, sender=UserDetails)
+@receiver(post_delete, sender=UserDetails)
+def invalidate_user_details(sender, instance, **kwargs):
+    invalidate_profiles([instance.user_id])
@@ -0,0 +1,71 @@
+from unittest.mock import patch
+
+from core.test.testhelpers import TestCase
+from users.autocomplete import get_suggestions, invalidate_autocomplete
+from users.models import User
+
+
+class AutocompleteTestCase(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        for username in ['bobby.marley', 'bob', 'big.bobman', 'bobbie']:
+            User.objects.create(username=username, display_name=username.title())
+
+    def _usernames(self, prefix, **kwargs):
+        return [user['username'] for user in get_suggestions(prefix, **kwargs)]
+
+    def test_get_suggestions(self):
+        self.assertEqual(['bob', 'bobbie', 'bobby.marley'], self._usernames('bob'))
+        self.assertEqual(['bobby.marley'], self._usernames('bobby'))
+        self.assertEqual([], self._usernames('x'))
+
+    def test_limit(self):
+        self.assertEqual(['big.bobman', 'bob'], self._usernames('b', limit=2))
+
+    def test_served_from_memory(self):
+        get_suggestions('bob')
+
+        with self.assertNumQueries(0):
+            get_suggestions('bob')
+
+    def test_created_user(self):
+        get_suggestions('bob')
+
+        with self.runOnCommitCallbacks():
+            User.objects.create(username='bobcat')
+            User.objects.bulk_get_or_create(['Bobo Resident'])
+
+        with self.assertNumQueries(1):
+            self.assertEqual(['bob', 'bobbie', 'bobby.marley', 'bobcat', 'bobo'], self._usernames('bob'))
+
+    def test_created_user_not_committed(self):
+        get_suggestions('bob')
+
+        # Another worker would load the index before it can see the user
+        User.objects.create(username='bobcat')
+
+        with self.assertNumQueries(0):
+            self.assertEqual(['bob', 'bobbie', 'bobby.marley'], self._usernames('bob'))
+
+    def test_deleted_user(self):
+        get_suggestions('bob')
+
+        User.objects.filter(username='bobbie').delete()
+
+        self.assertEqual(['bob', 'bobby.marley'], self._usernames('bob'))
+
+    def test_rebuilt_on_new_generation(self):
+        get_suggestions('bob')
+        User.objects.filter(username='bob').update(username='rob')
+
+        invalidate_autocomplete()
+
+        self.assertEqual(['rob'], self._usernames('rob'))
+
+    def test_rebuilt_when_expired(self):
+        get_suggestions('bob')
+        User.objects.filter(username='bob').update(username='rob')
+
+        with patch('users.autocomplete.AUTOCOMPLETE_REBUILD_INTERVAL', -1):
+            self.assertEqual(['rob'], self._usernames('rob'))
@@ -0,0 +1,140 @@
+from unittest.mock import patch
+
+from django.core.cache import cache
+
+from core.test.testhelpers import TestCase
+from users import leaderboard
+from users.leaderboard import get_leaderboard, get_ranks
+from users.models import User
+
+
+class LeaderboardTestCase(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user1 = User.objects.create(username='user1', goals=5)
+        self.user2 = User.objects.create(username='user2', goals=3)
+        self.user3 = User.objects.create(username='user3', goals=3)
+        User.objects.create(username='test-1', goals=10, is_test=True)
+
+    def test_get_leaderboard(self):
+        entries = get_leaderboard('goals')
+
+        self.assertEqual(['user1', 'user2', 'user3'], [entry['username'] for entry in entries])
+        self.assertEqual([1, 2, 2], [entry['rank'] for entry in entries])
+        self.assertEqual([5, 3, 3], [entry['value'] for entry in entries])
+
+    def test_cached(self):
+        get_leaderboard('goals')
+
+        with self.assertNumQueries(0):
+            get_leaderboard('goals')
+
+    def test_updated_by_add_stat(self):
+        get_leaderboard('goals')
+
+        with self.runOnCommitCallbacks():
+            self.user3.add_stat('goal', 3)
+
+        with self.assertNumQueries(0):
+            entries = get_leaderboard('goals')
+        self.assertEqual(['user3', 'user1', 'user2'], [entry['username'] for entry in entries])
+        self.assertEqual(6, entries[0]['value'])
+
+    def test_updated_by_bulk_add_match(self):
+        get_leaderboard('matches')
+
+        with self.runOnCommitCallbacks():
+            User.objects.bulk_add_match([self.user2])
+
+        with self.assertNumQueries(0):
+            entries = get_leaderboard('matches')
+        self.assertEqual('user2', entries[0]['username'])
+        self.assertEqual(1, entries[0]['value'])
+
+    def test_not_cached_during_other_rebuild(self):
+        cache.add('leaderboard:goals:rebuild', True)
+
+        self.assertEqual('user1', get_leaderboard('goals')[0]['username'])
+        self.assertIsNone(cache.get('leaderboard:goals'))
+
+    def test_dropped_out_of_full_leaderboard(self):
+        self.using(patch('users.leaderboard.LEADERBOARD_SIZE', 2))
+        get_leaderboard('goals')
+
+        with self.runOnCommitCallbacks():
+            self.user1.add_stat('goal', -5)
+
+        entries = get_leaderboard('goals')
+        self.assertEqual(['user2', 'user3'], [entry['username'] for entry in entries])
+
+    def test_entered_full_leaderboard(self):
+        self.using(patch('users.leaderboard.LEADERBOARD_SIZE', 2))
+        get_leaderboard('goals')
+
+        with self.runOnCommitCallbacks():
+            self.user3.add_stat('goal', 1)
+
+        with self.assertNumQueries(0):
+            entries = get_leaderboard('goals')
+        self.assertEqual(['user1', 'user3'], [entry['username'] for entry in entries])
+
+    def test_get_ranks(self):
+        self.using(patch('users.leaderboard.LEADERBOARD_SIZE', 1))
+        get_leaderboard('goals')
+
+        ranks = get_ranks(self.user3)
+
+        self.assertEqual(2, ranks['goals'])
+        self.assertEqual(1, ranks['matches'])
+
+    def test_ranks_cached(self):
+        self.using(patch('users.leaderboard.LEADERBOARD_SIZE', 1))
+        get_leaderboard('goals')
+        get_ranks(self.user3)
+
+        with self.assertNumQueries(0):
+            ranks = get_ranks(self.user2)
+
+        self.assertEqual(2, ranks['goals'])
+
+    def test_rank_below_every_value(self):
+        self.using(patch('users.leaderboard.LEADERBOARD_SIZE', 1))
+        get_leaderboard('goals')
+        user = User.objects.create(username='user4', goals=-1)
+
+        self.assertEqual(4, get_ranks(user)['goals'])
+
+    def test_invalidate(self):
+        get_leaderboard('goals')
+        User.objects.filter(id=self.user2.id).update(goals=10)
+
+        leaderboard.invalidate_leaderboards()
+
+        self.assertEqual('user2', get_leaderboard('goals')[0]['username'])
+
+
+class LeaderboardViewTest(TestCase):
+
+    def test_success(self):
+        User.objects.create(username='user1', assists=2)
+
+        response = self.client.get('/api/v1/users/leaderboards/assists/')
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual('user1', response.data[0]['username'])
+        self.assertEqual(2, response.data[0]['value'])
+
+    def test_not_found(self):
+        response = self.client.get('/api/v1/users/leaderboards/password/')
+
+        self.assertEqual(404, response.status_code)
+
+    def test_ranks(self):
+        User.objects.create(username='user1', kcoins=20)
+        user = User.objects.create(username='user2', kcoins=10)
+
+        response = self.client.get(f'/api/v1/users/profile/{user.id}/ranks/')
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(2, response.data['kcoins'])
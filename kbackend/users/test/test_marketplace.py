@@ -0,0 +1,62 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.exceptions import ValidationError
+
+from core.test.testhelpers import TestCase
+from users.marketplace import MARKETPLACE_FILTERS, MARKETPLACE_ORDERINGS, get_marketplace_page
+from users.models import User
+
+
+class MarketplaceTestCase(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.players = [User.objects.create(username=f'player{i}', available_for_transfer=True, goals=i // 2, assists=i % 3,
+                                            matches=5) for i in range(8)]
+        User.objects.create(username='unlisted', goals=100)
+
+    def _usernames(self, parameters):
+        return [user['username'] for user in get_marketplace_page(parameters)['results']]
+
+    def test_sort(self):
+        self.assertEqual(['player6', 'player7', 'player4', 'player5'], self._usernames({'sort': 'goals', 'page_size': 4}))
+
+    def test_filter(self):
+        self.assertEqual(['player2', 'player5'], self._usernames({'min_assists': '2'}))
+        self.assertEqual(['player7', 'player4', 'player5'], self._usernames({'sort': 'goals', 'min_goals': '2', 'min_assists': '1'}))
+
+    def test_pages_with_ties(self):
+        usernames = []
+        parameters = {'sort': 'goals', 'page_size': 3}
+        while True:
+            page = get_marketplace_page(parameters)
+            usernames += [user['username'] for user in page['results']]
+            if not page['next']:
+                break
+            parameters['cursor'] = page['next']
+
+        self.assertEqual(['player6', 'player7', 'player4', 'player5', 'player2', 'player3', 'player0', 'player1'], usernames)
+
+    def test_invalid_sort(self):
+        self.assertRaises(ValidationError, lambda: get_marketplace_page({'sort': 'password'}))
+
+    def test_invalid_filter(self):
+        self.assertRaises(ValidationError, lambda: get_marketplace_page({'min_goals': 'many'}))
+
+    def test_query_plans(self):
+        # Every combination of a sort and a filter walks an index in the sort order, on the first and on later pages
+        for sort in MARKETPLACE_ORDERINGS:
+            for parameter in [None, *MARKETPLACE_FILTERS]:
+                parameters = {'sort': sort, 'page_size': 1}
+                if parameter:
+                    parameters[parameter] = '1'
+                for _ in range(2):
+                    with CaptureQueriesContext(connection) as queries:
+                        page = get_marketplace_page(parameters)
+                    parameters['cursor'] = page['next']
+
+                    with connection.cursor() as cursor:
+                        cursor.execute(f'EXPLAIN QUERY PLAN {queries[-1]["sql"]}')
+                        plan = [row[-1] for row in cursor.fetchall()]
+                    self.assertEqual(1, len(plan), (parameters, plan))
+                    self.assertRegex(plan[0], r'^(SCAN|SEARCH) users_user USING INDEX user_marketplace_', (parameters, plan))
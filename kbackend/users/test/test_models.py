@@ -1,6 +1,7 @@
 from django.contrib.auth import authenticate
 from core.test.testhelpers import TestCase
-from users.models import User
+from users.models import User, UsernameTrigram
+from soccer.models import SoccerStat
 from rest_framework.exceptions import ValidationError, PermissionDenied
 
 
@@ -15,10 +16,13 @@ class GetOrCreateUserTestCase(TestCase):
         self.assertTrue(user.is_active)
 
     def test_new(self):
-        user = User.objects.get_or_create('John SmiTH')
+        # Including the trigrams of the username
+        with self.assertNumQueries(3):
+            user = User.objects.get_or_create('John SmiTH')
 
         self.assertEqual('john.smith', user.username)
         self.assertFalse(user.is_active)
+        self.assertFalse(user.has_usable_password())
         self.assertEqual('John SmiTH', user.display_name)
 
     def test_invalid_name(self):
@@ -52,6 +56,24 @@ class BulkGetOrCreateTestCase(TestCase):
         usernames = [user.username for user in users]
         self.assertEqual(set(['usera', 'userb', 'userc']), set(usernames))
 
+    def test_new_users_are_not_registered(self):
+        users = User.objects.bulk_get_or_create(['John Sonmez', 'John Sonmez'])
+
+        self.assertEqual(1, len(users))
+        self.assertIsNotNone(users[0].id)
+        self.assertFalse(users[0].is_active)
+        self.assertFalse(users[0].has_usable_password())
+
+    def test_query_count(self):
+        User.objects.create(username='player0')
+        names = [f'Player{i}' for i in range(22)]
+
+        # Including the trigrams of the usernames
+        with self.assertNumQueries(4):
+            users = User.objects.bulk_get_or_create(names)
+
+        self.assertEqual(22, len(users))
+
 
 class BulkAddMatchTestCase(TestCase):
 
@@ -68,6 +90,29 @@ class BulkAddMatchTestCase(TestCase):
         self.assertEqual(4, users[1].matches)
 
 
+class BulkAddStatsTestCase(TestCase):
+
+    def test_success(self):
+        user1 = User.objects.create(username='user1', goals=2)
+        user2 = User.objects.create(username='user2')
+        stats = [
+            SoccerStat(user=user1, stat_type='goal', value=1),
+            SoccerStat(user=user1, stat_type='goal', value=1),
+            SoccerStat(user=user1, stat_type='assist', value=1),
+            SoccerStat(user=user1, stat_type='yellow', value=1),
+            SoccerStat(user=user2, stat_type='kcoins', value=10),
+        ]
+
+        with self.assertNumQueries(1):
+            User.objects.bulk_add_stats(stats)
+
+        user1.refresh_from_db()
+        user2.refresh_from_db()
+        self.assertEqual(4, user1.goals)
+        self.assertEqual(1, user1.assists)
+        self.assertEqual(10, user2.kcoins)
+
+
 class ChangePasswordTestCase(TestCase):
 
     def setUp(self):
@@ -119,6 +164,20 @@ class AddStatTest(TestCase):
         self.user.refresh_from_db()
         self.assertEqual(1, self.user.assists)
 
+    def test_add_stat_with_stale_instance(self):
+        stale_user = User.objects.get(id=self.user.id)
+        self.user.add_stat('goal', 1)
+        stale_user.add_stat('goal', 1)
+
+        self.user.refresh_from_db()
+        self.assertEqual(2, self.user.goals)
+
+    def test_add_stat_only_updates_counter(self):
+        with self.assertNumQueries(1) as context:
+            self.user.add_stat('goal', 1)
+
+        self.assertNotIn('password', context.captured_queries[0]['sql'])
+
     def test_add_stat_not_cached(self):
         self.user.add_stat('red', 1)
 
@@ -146,3 +205,29 @@ class ResetPasswordTest(TestCase):
         User.objects.create_user('john.smith', password='existing-password', is_staff=True)
 
         self.assertRaises(PermissionDenied, lambda: User.objects.reset_password('john.smith', 'JohN SmiTh', 'john@gmail.com', self.dummy_uuid, 'new-password'))
+
+
+class UsernameTrigramTestCase(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('john.smith')
+
+    def _user_ids(self, text):
+        return list(UsernameTrigram.objects.user_ids_containing(text).values_list('user_id', flat=True))
+
+    def test_renamed(self):
+        user = User.objects.get(id=self.user.id)
+        user.username = 'jane.doe'
+        user.save()
+
+        self.assertEqual([], self._user_ids('smith'))
+        self.assertEqual([user.id], self._user_ids('doe'))
+
+    def test_not_rewritten_by_other_saves(self):
+        user = User.objects.get(id=self.user.id)
+        user.introduction = 'Striker'
+
+        with self.assertNumQueries(1):
+            user.save()
+        self.assertEqual([user.id], self._user_ids('smith'))
@@ -0,0 +1,90 @@
+from core import metrics
+from core.test.testhelpers import TestCase
+from soccer.views import MatchesView, SoccerStatsView
+from users.models import User, UserDetails
+from users.profile_cache import get_profile
+
+
+class ProfileCacheTestCase(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create(username='john.smith')
+        self.details = UserDetails.objects.create(user=self.user, biography='This is my bio.')
+
+    def test_cached(self):
+        get_profile(self.user.id)
+
+        with self.assertNumQueries(0):
+            profile = get_profile(self.user.id)
+        self.assertEqual('This is my bio.', profile['data']['user_details'][0]['biography'])
+        self.assertEqual(self.details.updated_at, profile['last_modified'])
+
+    def test_not_found(self):
+        self.assertIsNone(get_profile(111))
+
+    def test_hit_and_miss_counters(self):
+        misses = metrics.get_counter('profile_cache_misses')
+        hits = metrics.get_counter('profile_cache_hits')
+
+        get_profile(self.user.id)
+        get_profile(self.user.id)
+
+        self.assertEqual(misses + 1, metrics.get_counter('profile_cache_misses'))
+        self.assertEqual(hits + 1, metrics.get_counter('profile_cache_hits'))
+
+    def test_invalidated_by_user_save(self):
+        get_profile(self.user.id)
+
+        self.user.introduction = 'Hi'
+        self.user.save()
+
+        self.assertEqual('Hi', get_profile(self.user.id)['data']['introduction'])
+
+    def test_invalidated_by_user_details(self):
+        get_profile(self.user.id)
+
+        self.details.biography = 'New bio'
+        self.details.save()
+        self.assertEqual('New bio', get_profile(self.user.id)['data']['user_details'][0]['biography'])
+
+        self.details.delete()
+        self.assertEqual([], get_profile(self.user.id)['data']['user_details'])
+
+    def test_invalidated_by_user_delete(self):
+        get_profile(self.user.id)
+
+        self.user.delete()
+
+        self.assertIsNone(get_profile(self.user.id))
+
+    def test_invalidated_by_add_stat(self):
+        get_profile(self.user.id)
+
+        with self.runOnCommitCallbacks():
+            self.user.add_stat('goal', 2)
+
+        self.assertEqual(2, get_profile(self.user.id)['data']['goals'])
+
+    def test_invalidated_by_new_match(self):
+        get_profile(self.user.id)
+
+        with self.runOnCommitCallbacks():
+            MatchesView.create_match({'home_team': 'A', 'away_team': 'B', 'home_players': ['John Smith'], 'away_players': ['Big Bob']})
+
+        self.assertEqual(1, get_profile(self.user.id)['data']['matches'])
+
+    def test_invalidated_by_stat_batch(self):
+        get_profile(self.user.id)
+
+        with self.runOnCommitCallbacks():
+            SoccerStatsView.create_stats([{'username': 'John Smith', 'stat_type': 'assist', 'value': 1, 'stat_uuid': self.dummy_uuid}])
+
+        self.assertEqual(1, get_profile(self.user.id)['data']['assists'])
+
+    def test_not_invalidated_before_commit(self):
+        get_profile(self.user.id)
+
+        with self.runOnCommitCallbacks():
+            SoccerStatsView.create_stats([{'username': 'John Smith', 'stat_type': 'assist', 'value': 1, 'stat_uuid': self.dummy_uuid}])
+            self.assertEqual(0, get_profile(self.user.id)['data']['assists'])
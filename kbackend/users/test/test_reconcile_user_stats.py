@@ -0,0 +1,64 @@
+from io import StringIO
+
+from django.core.management import call_command
+
+from core.test.testhelpers import TestCase
+from soccer.models import Match, MatchParticipation, SoccerStat
+from users.leaderboard import get_leaderboard
+from users.marketplace import get_marketplace_page
+from users.models import User
+
+
+class ReconcileUserStatsTestCase(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user1 = User.objects.create(username='user1', goals=5, matches=1)
+        self.user2 = User.objects.create(username='user2', goals=1, kcoins=10)
+        self.user3 = User.objects.create(username='user3')
+
+        match = Match.objects.create(home_team='A', away_team='B')
+        MatchParticipation.objects.create(user=self.user1, match=match, side='home')
+        MatchParticipation.objects.create(user=self.user2, match=match, side='away')
+        SoccerStat.objects.create(user=self.user1, match=match, stat_type='goal', value=1, stat_uuid='1')
+        SoccerStat.objects.create(user=self.user1, match=match, stat_type='yellow', value=1, stat_uuid='2')
+        SoccerStat.objects.create(user=self.user2, match=match, stat_type='goal', value=1, stat_uuid='3')
+        SoccerStat.objects.create(user=self.user2, match=match, stat_type='kcoins', value=10, stat_uuid='4')
+
+    def _call(self, *args):
+        stdout = StringIO()
+        call_command('reconcile_user_stats', *args, stdout=stdout)
+        return stdout.getvalue()
+
+    def test_reconcile(self):
+        output = self._call('--chunk-size', '2')
+
+        self.user1.refresh_from_db()
+        self.user2.refresh_from_db()
+        self.assertEqual((1, 1), (self.user1.goals, self.user1.matches))
+        self.assertEqual((1, 10, 1), (self.user2.goals, self.user2.kcoins, self.user2.matches))
+        self.assertIn('Checked 3 users, 2 updated', output)
+
+    def test_dry_run(self):
+        output = self._call('--dry-run')
+
+        self.user1.refresh_from_db()
+        self.assertEqual(5, self.user1.goals)
+        self.assertIn('user1: goals 5 -> 1', output)
+        self.assertIn('user2: matches 0 -> 1', output)
+        self.assertIn('Checked 3 users, 2 would be updated', output)
+
+    def test_leaderboards_invalidated(self):
+        get_leaderboard('goals')
+
+        self._call()
+
+        self.assertEqual([1, 1, 0], [entry['value'] for entry in get_leaderboard('goals')])
+
+    def test_marketplace_invalidated(self):
+        User.objects.filter(id=self.user1.id).update(available_for_transfer=True)
+        self.assertEqual(1, len(get_marketplace_page({'min_goals': '2'})['results']))
+
+        self._call()
+
+        self.assertEqual([], get_marketplace_page({'min_goals': '2'})['results'])
@@ -9,7 +9,9 @@ from rest_framework.exceptions import AuthenticationFailed, ValidationError
 
 from core.test.testhelpers import TestCase
 from users.models import User, UserDetails
-from users.views import PasswordResetView, LoginView, LogoutView, UserSearchview
+from users.serializers import UserProfileEditSerializer
+from users.views import PasswordResetView, LoginView, LogoutView, UserAutocompleteView, UserSearchview
+from soccer.views import MatchesView, SoccerStatsView
 
 
 class PasswordResetIntegrationTest(TestCase):
@@ -203,6 +205,39 @@ class UserSearchTest(TestCase):
         self.assertEqual(200, response.status_code)
         self.assertEqual([], response.data)
 
+    def test_ranking(self):
+        for username in ['big.bobman', 'bobby.marley', 'bob', 'al.bob']:
+            User.objects.create_user(username, uuid=self.dummy_uuid, password='abcd')
+
+        response = self.view.search({'username': 'bob'})
+
+        usernames = [user['username'] for user in response.data]
+        self.assertEqual(['bob', 'bobby.marley', 'al.bob', 'big.bobman'], usernames)
+
+    def test_same_trigrams_without_substring(self):
+        User.objects.create_user('bcab.abca', uuid=self.dummy_uuid, password='abcd')
+
+        response = self.view.search({'username': 'abcabc'})
+
+        self.assertEqual([], response.data)
+
+    def test_non_registered_users(self):
+        User.objects.bulk_get_or_create(['Bobby Marley'])
+        User.objects.get_or_create('Big Bobman')
+
+        response = self.view.search({'username': 'bob'})
+
+        usernames = [user['username'] for user in response.data]
+        self.assertEqual(['bobby.marley', 'big.bobman'], usernames)
+
+    def test_renamed_user(self):
+        user = User.objects.create_user('bobby.marley', uuid=self.dummy_uuid, password='abcd')
+        user.username = 'john.smith'
+        user.save()
+
+        self.assertEqual([], self.view.search({'username': 'bob'}).data)
+        self.assertEqual(1, len(self.view.search({'username': 'smith'}).data))
+
     def test_with_too_short_username(self):
         self.assertRaises(ValidationError, lambda: self.view.search({'username': 'b'}))
 
@@ -210,6 +245,21 @@ class UserSearchTest(TestCase):
         self.assertRaises(ValidationError, lambda: self.view.search({}))
 
 
+class UserAutocompleteTest(TestCase):
+
+    def test_success(self):
+        User.objects.create_user('bobby.marley', uuid=self.dummy_uuid, password='abcd')
+        User.objects.create_user('john.smith', uuid=self.dummy_uuid, password='abcdef')
+
+        response = self.client.get('/api/v1/users/autocomplete/?prefix=Bobby M')
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(['bobby.marley'], [user['username'] for user in response.data])
+
+    def test_empty_prefix(self):
+        self.assertEqual([], UserAutocompleteView.autocomplete({}).data)
+
+
 class PlayerMarketplaceTest(TestCase):
 
     def test_success(self):
@@ -222,8 +272,47 @@ class PlayerMarketplaceTest(TestCase):
 
         self.assertEqual(200, response.status_code)
 
-        usernames = [user['username'] for user in response.data]
-        self.assertEqual(set(['john.smith', 'newplayer']), set(usernames))
+        usernames = [user['username'] for user in response.data['results']]
+        self.assertEqual(['john.smith', 'newplayer'], usernames)
+        self.assertIsNone(response.data['next'])
+
+    def test_pages(self):
+        for i in range(5):
+            User.objects.create_user(f'player{i}', available_for_transfer=True, uuid=self.dummy_uuid, password='abcd')
+
+        response = self.client.get('/api/v1/users/marketplace/?page_size=3')
+        self.assertEqual(['player0', 'player1', 'player2'], [user['username'] for user in response.data['results']])
+
+        response = self.client.get(f'/api/v1/users/marketplace/?page_size=3&cursor={response.data["next"]}')
+        self.assertEqual(['player3', 'player4'], [user['username'] for user in response.data['results']])
+        self.assertIsNone(response.data['next'])
+
+    def test_cached(self):
+        User.objects.create_user('john.smith', available_for_transfer=True, uuid=self.dummy_uuid, password='abcd')
+        self.client.get('/api/v1/users/marketplace/')
+
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/v1/users/marketplace/')
+        self.assertEqual(1, len(response.data['results']))
+
+    def test_invalidated_by_profile_edit(self):
+        listed = User.objects.create_user('john.smith', available_for_transfer=True, uuid=self.dummy_uuid, password='abcd')
+        unlisted = User.objects.create_user('bobby.marley', uuid=self.dummy_uuid, password='abcd')
+        self.client.get('/api/v1/users/marketplace/')
+
+        serializer = UserProfileEditSerializer(unlisted, {'available_for_transfer': True}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        response = self.client.get('/api/v1/users/marketplace/')
+        self.assertEqual(['bobby.marley', 'john.smith'], [user['username'] for user in response.data['results']])
+
+        serializer = UserProfileEditSerializer(listed, {'introduction': 'Hi'}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        response = self.client.get('/api/v1/users/marketplace/')
+        self.assertEqual('Hi', response.data['results'][1]['introduction'])
 
 
 class GetUserProfileTest(TestCase):
@@ -247,6 +336,131 @@ class GetUserProfileTest(TestCase):
         self.assertEqual(404, response.status_code)
 
 
+class ConditionalGetTest(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('john.smith', uuid=self.dummy_uuid, password='abcdef', available_for_transfer=True)
+        self.details = UserDetails.objects.create(user=self.user, biography='This is my bio.')
+
+    def _get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(200, response.status_code)
+        return response, self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_profile_not_modified(self):
+        response = self.client.get(f'/api/v1/users/profile/{self.user.id}/')
+
+        with self.assertNumQueries(0):
+            not_modified = self.client.get(f'/api/v1/users/profile/{self.user.id}/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(304, not_modified.status_code)
+
+    def test_profile_if_modified_since(self):
+        response = self.client.get(f'/api/v1/users/profile/{self.user.id}/')
+
+        not_modified = self.client.get(f'/api/v1/users/profile/{self.user.id}/', HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(304, not_modified.status_code)
+
+    def test_profile_modified(self):
+        response = self.client.get(f'/api/v1/users/profile/{self.user.id}/')
+
+        self.details.biography = 'New bio'
+        self.details.save()
+        details_changed = self.client.get(f'/api/v1/users/profile/{self.user.id}/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(200, details_changed.status_code)
+
+        with self.runOnCommitCallbacks():
+            self.user.add_stat('goal', 1)
+        stat_added = self.client.get(f'/api/v1/users/profile/{self.user.id}/', HTTP_IF_NONE_MATCH=details_changed['ETag'])
+        self.assertEqual(200, stat_added.status_code)
+        self.assertEqual(1, stat_added.data['goals'])
+
+    def test_profile_not_found(self):
+        response = self.client.get('/api/v1/users/profile/111/', HTTP_IF_NONE_MATCH='"abc"')
+
+        self.assertEqual(404, response.status_code)
+
+    def test_private_profile(self):
+        self.client.force_login(self.user)
+
+        _, not_modified = self._get('/api/v1/users/me/profile/')
+
+        self.assertEqual(304, not_modified.status_code)
+
+    def test_marketplace(self):
+        response, not_modified = self._get('/api/v1/users/marketplace/')
+        self.assertEqual(304, not_modified.status_code)
+
+        serializer = UserProfileEditSerializer(self.user, {'available_for_transfer': False}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        modified = self.client.get('/api/v1/users/marketplace/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(200, modified.status_code)
+
+    def test_search(self):
+        response, not_modified = self._get('/api/v1/users/search/?username=smith')
+        self.assertEqual(304, not_modified.status_code)
+
+        User.objects.get_or_create('Will Smith')
+
+        modified = self.client.get('/api/v1/users/search/?username=smith', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(200, modified.status_code)
+
+    def test_search_user_left(self):
+        User.objects.get_or_create('Will Smith')
+        response = self.client.get('/api/v1/users/search/?username=smith')
+
+        User.objects.filter(username='will.smith').delete()
+
+        modified = self.client.get('/api/v1/users/search/?username=smith', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(200, modified.status_code)
+
+    def test_search_not_modified_skips_search(self):
+        response = self.client.get('/api/v1/users/search/?username=smith')
+
+        with self.assertNumQueries(1):
+            not_modified = self.client.get('/api/v1/users/search/?username=smith', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(304, not_modified.status_code)
+
+    def test_search_without_last_modified(self):
+        response = self.client.get('/api/v1/users/search/?username=smith')
+
+        self.assertNotIn('Last-Modified', response)
+
+
+class GetUserMatchesTest(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        for i in range(3):
+            response = MatchesView.create_match({'home_team': f'Team {i}', 'away_team': 'Team X', 'home_players': ['userA'], 'away_players': ['userB']})
+            SoccerStatsView.create_stats([
+                {'username': 'userA', 'stat_uuid': f'uuid-a{i}', 'stat_type': 'goal', 'value': 1, 'match': response.data['id'], 'side': 'home'},
+                {'username': 'userB', 'stat_uuid': f'uuid-b{i}', 'stat_type': 'goal', 'value': 1, 'match': response.data['id'], 'side': 'away'},
+            ])
+        self.user = User.objects.get(username='usera')
+
+    def test_success(self):
+        with self.assertNumQueries(3):
+            response = self.client.get(f'/api/v1/users/profile/{self.user.id}/matches/?page_size=2')
+
+        self.assertEqual(200, response.status_code)
+        results = response.data['results']
+        self.assertEqual(['Team 2', 'Team 1'], [result['match']['home_team'] for result in results])
+        self.assertEqual('home', results[0]['side'])
+        self.assertEqual(['goal'], [stat['stat_type'] for stat in results[0]['stats']])
+
+        response = self.client.get(f'/api/v1/users/profile/{self.user.id}/matches/?page_size=2&cursor={response.data["next"]}')
+        self.assertEqual(['Team 0'], [result['match']['home_team'] for result in response.data['results']])
+        self.assertIsNone(response.data['next'])
+
+    def test_not_found(self):
+        response = self.client.get('/api/v1/users/profile/1234/matches/')
+
+        self.assertEqual(404, response.status_code)
+
+
 class PatchUserProfileTest(TestCase):
     def setUp(self):
         super().setUp()
@@ -7,8 +7,12 @@ urlpatterns = [
     path('login/', views.LoginView.as_view()),
     path('logout/', views.LogoutView.as_view()),
     path('search/', views.UserSearchview.as_view()),
+    path('autocomplete/', views.UserAutocompleteView.as_view()),
     path('marketplace/', views.PlayerMarketplaceView.as_view()),
+    path('leaderboards/<str:counter>/', views.LeaderboardView.as_view()),
     path('profile/<int:user_id>/', views.UserProfileView.as_view()),
+    path('profile/<int:user_id>/ranks/', views.UserRanksView.as_view()),
+    path('profile/<int:user_id>/matches/', views.UserMatchesView.as_view()),
     path('me/profile/', views.PrivateUserProfileView.as_view()),
     path('test-users/', views.TestUsersView.as_view()),
 ]
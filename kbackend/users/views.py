@@ -1,10 +1,11 @@
 import logging
 
 from django.contrib.auth import authenticate, login, logout
+from django.db.models import Count, Max, Prefetch
 from django.shortcuts import get_object_or_404
 from ratelimit.core import is_ratelimited
 from ratelimit.exceptions import Ratelimited
-from rest_framework.exceptions import AuthenticationFailed, PermissionDenied, ValidationError
+from rest_framework.exceptions import AuthenticationFailed, NotFound, PermissionDenied, ValidationError
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
@@ -12,8 +13,16 @@ import nanoid
 
 from users.models import User
 from core.basic_auth import ServerBasicAuthentication
-from users.serializers import UserListItem, UserProfileSerializer, UserProfileEditSerializer, LoginSerializer, PrivateUserProfileSerializer
+from core.conditional import conditional_get
+from core.pagination import keyset_paginate
+from soccer.models import MatchParticipation, SoccerStat
+from soccer.serializers import PlayerMatchSerializer
+from users.serializers import UserListItem, UserProfileEditSerializer, LoginSerializer, PrivateUserProfileSerializer
 from users.helpers import get_test_users, normalize_display_name, to_username, input_to_username
+from users.autocomplete import get_suggestions
+from users.marketplace import get_versioned_marketplace_page
+from users.profile_cache import get_profile
+from users.leaderboard import LEADERBOARD_COUNTERS, get_leaderboard, get_ranks
 
 logger = logging.getLogger('users')
 
@@ -97,30 +106,95 @@ class LogoutView(APIView):
         return Response({})
 
 
+def _profile_version(request, user_id):
+    # Kept for the view, so that the cache is read once per request
+    request.profile = get_profile(user_id)
+    if request.profile is None:
+        return None
+    return request.profile['last_modified'], request.profile['data']
+
+
+def _private_profile_version(request):
+    row = (User.objects.filter(id=request.user.id)
+           .annotate(details_updated_at=Max('user_details__updated_at'), details_count=Count('user_details'))
+           .values_list('updated_at', 'details_updated_at', 'details_count').first())
+    if row is None:
+        return None
+    updated_at, details_updated_at, details_count = row
+    return max(updated_at, details_updated_at or updated_at), request.user.id, details_count
+
+
+def _search_version(request):
+    # Without the ranking, a user that joins the results is newer and one that leaves them changes the count. No
+    # Last-Modified, a user deleted or renamed out of the results would make the search older.
+    users = User.objects.filter_by_name(UserSearchview.get_search_term(request.GET))
+    version = users.aggregate(updated_at=Max('updated_at'), count=Count('id'))
+    return None, version['updated_at'], version['count']
+
+
+def _marketplace_version(request):
+    # Kept for the view, the page comes from the cache and is not hashed
+    version, request.marketplace_page = get_versioned_marketplace_page(request.GET)
+    return None, version
+
+
 class UserSearchview(APIView):
 
+    @conditional_get(_search_version)
     def get(self, request):
         return self.search(request.GET)
 
     @classmethod
     def search(cls, parameters):
+        found_users = User.objects.search_by_name(cls.get_search_term(parameters))
+
+        data = UserListItem(found_users, many=True).data
+        return Response(data)
+
+    @staticmethod
+    def get_search_term(parameters):
         username = input_to_username(parameters.get('username', ''))
         if len(username) < 3:
             raise ValidationError(f'Search term "{username}" is too short')
+        return username
 
-        found_users = User.objects.search_by_name(username)
 
-        data = UserListItem(found_users, many=True).data
-        return Response(data)
+class UserAutocompleteView(APIView):
+
+    def get(self, request):
+        return self.autocomplete(request.GET)
+
+    @classmethod
+    def autocomplete(cls, parameters):
+        prefix = input_to_username(parameters.get('prefix', ''))
+        if not prefix:
+            return Response([])
+
+        return Response(get_suggestions(prefix))
 
 
 class PlayerMarketplaceView(APIView):
 
+    @conditional_get(_marketplace_version)
     def get(self, request):
-        found_users = User.objects.search_marketplace()
+        return Response(request.marketplace_page)
 
-        data = UserListItem(found_users, many=True).data
-        return Response(data)
+
+class LeaderboardView(APIView):
+
+    def get(self, request, counter):
+        if counter not in LEADERBOARD_COUNTERS:
+            raise NotFound(f'No such leaderboard: {counter}')
+
+        return Response(get_leaderboard(counter))
+
+
+class UserRanksView(APIView):
+
+    def get(self, request, user_id):
+        user = get_object_or_404(User, id=user_id)
+
+        return Response(get_ranks(user))
 
 
 class UserProfileView(APIView):
@@ -130,10 +204,12 @@ class UserProfileView(APIView):
             return [AllowAny()]
         return [IsAuthenticated()]
 
+    @conditional_get(_profile_version)
     def get(self, request, user_id):
-        user = get_object_or_404(User, id=user_id)
+        if request.profile is None:
+            raise NotFound()
 
-        return Response(UserProfileSerializer(user).data)
+        return Response(request.profile['data'])
 
     def patch(self, request, user_id):
         user = get_object_or_404(User, id=user_id)
@@ -148,10 +224,24 @@ class UserProfileView(APIView):
         return Response(serializer.data)
 
 
+class UserMatchesView(APIView):
+
+    def get(self, request, user_id):
+        user = get_object_or_404(User, id=user_id)
+
+        player_stats = SoccerStat.objects.filter(user=user).order_by('created_at', 'id')
+        participations = (MatchParticipation.objects.filter(user=user, match__isnull=False).select_related('match')
+                          .prefetch_related(Prefetch('match__soccerstat_set', queryset=player_stats, to_attr='player_stats')))
+        participations, next_cursor = keyset_paginate(participations, ('-match__created_at', '-id'), request.GET)
+
+        return Response({'results': PlayerMatchSerializer(participations, many=True).data, 'next': next_cursor})
+
+
 class PrivateUserProfileView(APIView):
 
     permission_classes = [IsAuthenticated]
 
+    @conditional_get(_private_profile_version)
     def get(self, request):
         user = get_object_or_404(User, id=request.user.id)
 